@@ -1,10 +1,29 @@
 import os
+import time
+import uuid
 import asyncio
-import random
+import secrets
 import logging
+import tempfile
+from functools import partial
 from datetime import datetime, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
+from telegram.ext import Application, CallbackContext, CommandHandler, CallbackQueryHandler, ContextTypes, TypeHandler
+from scheduler import PhaseScheduler
+from fanout import DMFanout, PRIORITY_RESULT, PRIORITY_ANNOUNCE
+from outbox import Outbox
+from gif_cache import AnimationCache, is_stale_file_id
+from monitoring import HealthServer, metrics
+from webhook import WebhookReceiver, serve_webhook
+from sharding import HashRing, SeatDirectory, UPDATE_PATH, register_seat_lookup, serve_sharded, worker_socket_paths
+from persistence import SessionStore
+from stats import StatsStore
+from event_log import EventLog, state_digest
+from panels import ActionPanels
+from reachability import DMReachability
+import callbacks
+import engine
+from engine import GameState, ROLES, MIN_PLAYERS, MAX_PLAYERS
 
 # Configure logging
 logging.basicConfig(
@@ -16,91 +35,127 @@ logger = logging.getLogger(__name__)
 # Bot configuration
 BOT_TOKEN = os.getenv('BOT_TOKEN', '8253509018:AAFrrp0KSDv8_jk30aw2fK3XnTbp2RSprBg')
 PORT = int(os.environ.get('PORT', 8080))
-
-# Game state management
-class GameState:
-    def __init__(self):
-        self.players = {}  # {user_id: {'name': str, 'role': str, 'alive': bool, 'protected': bool}}
-        self.game_active = False
-        self.phase = "waiting"  # waiting, night, dawn, trial, banishment
-        self.votes = {}  # {voter_id: voted_for_id}
-        self.night_actions = {}  # {action_type: {user_id: target_id}}
-        self.group_chat_id = None
-        self.day_number = 0
-        self.phase_start_time = None
-        self.special_abilities_used = {}  # Track one-time abilities
-        
-    def reset(self):
-        self.__init__()
-    
-    def get_alive_players(self):
-        return {pid: pdata for pid, pdata in self.players.items() if pdata['alive']}
-    
-    def get_players_by_team(self, team):
-        return {pid: pdata for pid, pdata in self.players.items() 
-                if pdata['alive'] and ROLES.get(pdata['role'], {}).get('team') == team}
-
-game = GameState()
-
-# Enhanced role definitions with full features
-ROLES = {
-    'bloodseeker': {
-        'name': '🩸 Bloodseeker',
-        'description': 'Kill one player each night. Work with other evil players.',
-        'team': 'evil',
-        'action': 'kill',
-        'win_condition': 'Eliminate all good players or equal their numbers'
-    },
-    'oracle': {
-        'name': '🔮 Oracle', 
-        'description': 'Investigate one player each night to learn their alignment.',
-        'team': 'good',
-        'action': 'investigate',
-        'win_condition': 'Eliminate all evil players'
-    },
-    'guardian': {
-        'name': '🛡️ Guardian',
-        'description': 'Protect one player each night from death (including yourself).',
-        'team': 'good', 
-        'action': 'protect',
-        'win_condition': 'Eliminate all evil players'
-    },
-    'citizen': {
-        'name': '🌿 Citizen',
-        'description': 'Vote during trials to find and eliminate evil players.',
-        'team': 'good',
-        'action': None,
-        'win_condition': 'Eliminate all evil players'
-    },
-    'trickster': {
-        'name': '🃏 Trickster',
-        'description': 'Survive until the end. Can swap two players\' votes once per game.',
-        'team': 'neutral',
-        'action': 'swap',
-        'win_condition': 'Survive to the final 3 players'
-    },
-    'soulhunter': {
-        'name': '🏹 Soulhunter', 
-        'description': 'Evil assassin with one daytime kill ability.',
-        'team': 'evil',
-        'action': 'dayshoot',
-        'win_condition': 'Eliminate all good players or equal their numbers'
-    },
-    'justicar': {
-        'name': '⚖️ Justicar',
-        'description': 'Can cancel all votes once per game during trial phase.',
-        'team': 'good',
-        'action': 'cancel_votes',
-        'win_condition': 'Eliminate all evil players'
-    },
-    'spiritwalker': {
-        'name': '👻 Spiritwalker',
-        'description': 'Can communicate with dead players and learn one role.',
-        'team': 'good',
-        'action': 'commune',
-        'win_condition': 'Eliminate all evil players'
-    }
-}
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')  # Override the Bot API server, e.g. fake_telegram.py for load tests
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()  # 'polling' for development, 'webhook' for deployments; 'worker' is set by the ingress
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # Public HTTPS base URL that Telegram posts updates to
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')  # Checked against X-Telegram-Bot-Api-Secret-Token
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', 32))
+UPDATE_QUEUE_SIZE = int(os.getenv('UPDATE_QUEUE_SIZE', 1000))
+WORKERS = int(os.getenv('WORKERS', 1))  # >1 runs an ingress that shards sessions across this many processes
+WORKER_INDEX = int(os.getenv('WORKER_INDEX', 0))  # Set by the ingress for each worker
+WORKER_SOCKET = os.getenv('WORKER_SOCKET')  # Unix socket a worker takes forwarded updates on
+WORKER_SOCKET_DIR = os.getenv('WORKER_SOCKET_DIR', tempfile.gettempdir())
+LOBBY_COUNTDOWN = 5  # Pause after the 4th join (or the /gather size) before the game starts
+LOBBY_IDLE_TIMEOUT = int(os.getenv('LOBBY_IDLE_TIMEOUT', 600))  # Seconds a lobby short of players waits for the next /join
+CONVENING_DURATION = 10
+NIGHT_DURATION = 30  # Upper bound; ends early once every action is in
+DAWN_DURATION = 10
+TRIAL_DURATION = 45  # Upper bound; ends early once every vote is in
+BANISHMENT_DURATION = 10
+EARLY_RESOLUTION_GRACE = 3  # Seconds left to change your mind after the last submission
+PANEL_EDIT_WINDOW = 0.5  # Panel edits closer together than this are merged into one API call
+KEYBOARD_PAGE_SIZE = 10  # Target buttons per DM keyboard page; one button over shares the last page instead of opening another
+LIST_LIMIT = 10  # Names listed in a group announcement before the rest are summarised
+GIF_CACHE_PATH = os.getenv('GIF_CACHE_PATH', 'gif_cache.json')
+GIF_WARMUP_CHAT_ID = os.getenv('GIF_WARMUP_CHAT_ID')  # Optional scratch chat for pre-uploading GIFs
+DM_GLOBAL_RATE = float(os.getenv('DM_GLOBAL_RATE', 25))  # Bot-wide DM sends per second
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', 'sessions.db')  # SQLite file that survives restarts
+GAME_LOG_DIR = os.getenv('GAME_LOG_DIR', 'game_logs')  # Per-game event logs for replay.py
+STATS_DB_PATH = os.getenv('STATS_DB_PATH', 'stats.db')  # SQLite file behind /stats and /leaderboard
+DM_REACHABLE_TTL = int(os.getenv('DM_REACHABLE_TTL', 3600))  # Seconds a successful DM check is trusted
+DM_UNREACHABLE_TTL = int(os.getenv('DM_UNREACHABLE_TTL', 300))  # Seconds before re-probing a user who couldn't be DMed
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 8))  # Drain budget on SIGTERM; keep under the orchestrator's kill timeout
+
+# Session registry - one independent game per group chat
+sessions = {}  # {group_chat_id: GameState}
+player_sessions = {}  # {user_id: group_chat_id} routes DM buttons to the right game
+phase_scheduler = PhaseScheduler()  # Drives every session's phase timers
+dm_fanout = DMFanout(global_rate=DM_GLOBAL_RATE)  # Shared rate limits for DMs across all sessions
+action_panels = ActionPanels(dm_fanout, PANEL_EDIT_WINDOW)  # Each player's night/trial DM, edited every phase
+outbox = Outbox()  # Announcements and result DMs, delivered in the background so timers never wait on Telegram
+dm_reachability = DMReachability(DM_REACHABLE_TTL, DM_UNREACHABLE_TTL)  # Who has a private chat open with the bot
+health_server = HealthServer(PORT, path=WORKER_SOCKET)  # /health and /metrics on the container port
+session_store = SessionStore(SESSION_DB_PATH)  # Crash recovery for every live session
+event_log = EventLog(GAME_LOG_DIR)  # Replayable record of every game
+stats_store = StatsStore(STATS_DB_PATH)  # Finished games and the counters /stats and /leaderboard read
+shard_ring = HashRing(WORKERS)  # Which worker owns which group chat's session
+peer_seats = SeatDirectory([  # The other workers, asked before seating a player here
+    path for worker, path in enumerate(worker_socket_paths(WORKER_SOCKET_DIR, WORKERS))
+    if BOT_MODE == 'worker' and worker != WORKER_INDEX
+])
+
+metrics.gauge('shadowcourt_active_sessions', 'Game sessions held in memory', lambda: len(sessions))
+metrics.gauge('shadowcourt_running_games', 'Sessions with a game in progress',
+              lambda: sum(1 for game in sessions.values() if game.game_active))
+
+def get_game(chat_id):
+    """Get the session for a group chat, creating it on first use"""
+    game = sessions.get(chat_id)
+    if game is None:
+        game = sessions[chat_id] = GameState(chat_id)
+    return game
+
+def lobby_size(game):
+    """Players a lobby waits for before its countdown: the host's /gather size or the minimum"""
+    return game.lobby_target or MIN_PLAYERS
+
+def find_game(update):
+    """Find the session an update belongs to without creating one"""
+    chat = update.effective_chat
+    if chat.type == 'private':
+        chat_id = player_sessions.get(update.effective_user.id)
+        return sessions.get(chat_id) if chat_id is not None else None
+    return sessions.get(chat.id)
+
+def all_submitted(game):
+    """Whether every expected player has acted (night) or voted (trial)"""
+    if not game.expected_actors:
+        return False
+    if game.phase == "night":
+        return all(any(pid in actions for actions in game.night_actions.values()) for pid in game.expected_actors)
+    if game.phase == "trial":
+        return game.expected_actors <= game.votes.keys()
+    return False
+
+def enter_phase(game, phase):
+    """Move a session to a new phase, apply its rules and return the resulting events"""
+    now = datetime.now()
+    if game.phase_start_time is not None:
+        metrics.phase_duration.observe((now - game.phase_start_time).total_seconds(), phase=game.phase)
+    game.phase = phase
+    game.phase_start_time = now
+    _, events = engine.apply_phase(game, phase)
+    event_log.record(game, 'phase', phase, now.isoformat(), state_digest(game))
+    session_store.save(game)
+    return events
+
+def schedule_phase(context, game, delay, next_phase):
+    """Persist the session and arm the timer for its next phase"""
+    session_store.save(game)
+    phase_scheduler.schedule(game.group_chat_id, delay, next_phase, context, game)
+
+def end_session(game, reason, drop_pending=False):
+    """Evict a finished session so memory stays bounded.
+
+    Cancels the session's phase timer and any transition mid-flight. With
+    drop_pending, queued announcements and DMs for the game are dropped too,
+    so a game ended by hand falls silent at once.
+    """
+    phase_scheduler.cancel(game.group_chat_id)
+    if drop_pending:
+        outbox.discard([game.group_chat_id, *game.players])
+    if game.game_active or game.phase != "waiting":
+        enter_phase(game, "waiting")
+    for player_id in game.players:
+        if player_sessions.get(player_id) == game.group_chat_id:
+            del player_sessions[player_id]
+    action_panels.discard(game.players)
+    if sessions.get(game.group_chat_id) is game:
+        del sessions[game.group_chat_id]
+        session_store.delete(game.group_chat_id)
+    event_log.finish(game, reason)
+    game.reset()
 
 # Phase GIFs for immersive experience
 PHASE_GIFS = {
@@ -114,38 +169,88 @@ PHASE_GIFS = {
     'victory_evil': 'https://media.giphy.com/media/3o7TKBvOZ1VwfT1Yf6/giphy.gif'
 }
 
-def get_role_distribution(player_count):
-    """Advanced role distribution based on player count"""
-    if player_count == 4:
-        return ['bloodseeker', 'oracle', 'guardian', 'citizen']
-    elif player_count == 5:
-        return ['bloodseeker', 'oracle', 'guardian', 'citizen', 'trickster']
-    elif player_count == 6:
-        return ['bloodseeker', 'oracle', 'guardian', 'citizen', 'citizen', 'trickster']
-    elif player_count == 7:
-        return ['bloodseeker', 'bloodseeker', 'oracle', 'guardian', 'citizen', 'citizen', 'trickster']
-    elif player_count == 8:
-        return ['bloodseeker', 'bloodseeker', 'oracle', 'guardian', 'soulhunter', 'citizen', 'citizen', 'trickster']
-    elif player_count == 9:
-        return ['bloodseeker', 'bloodseeker', 'oracle', 'guardian', 'soulhunter', 'citizen', 'citizen', 'citizen', 'justicar']
-    else:  # 10+
-        return ['bloodseeker', 'bloodseeker', 'bloodseeker', 'oracle', 'guardian', 'soulhunter', 'spiritwalker', 'citizen', 'citizen', 'justicar']
+animation_cache = AnimationCache(PHASE_GIFS, GIF_CACHE_PATH)
+
+async def send_animation_cached(send_animation, send_text, gif_key, caption):
+    """Send a phase GIF by cached file_id, falling back to the URL and then plain text"""
+    cached = animation_cache.is_cached(gif_key)
+    try:
+        message = await send_animation(animation=animation_cache.get(gif_key), caption=caption, parse_mode='Markdown')
+    except Exception as e:
+        if not cached or not is_stale_file_id(e):
+            # Anything but a rejected file_id (rate limits, timeouts, a bad caption) keeps the cache
+            return await send_text(caption, parse_mode='Markdown')
+        # Stale file_id - forget it and upload from the source URL once more
+        logger.warning(f"Cached GIF '{gif_key}' rejected: {e}")
+        animation_cache.forget(gif_key)
+        return await send_animation_cached(send_animation, send_text, gif_key, caption)
+    
+    animation_cache.remember(gif_key, message)
+    return message
+
+async def send_group_post(bot, chat_id, text, gif_key):
+    """Deliver a queued group announcement with its GIF through the shared rate limits"""
+    async def send_text(text, **kwargs):
+        return await dm_fanout.send(bot.send_message, chat_id, PRIORITY_ANNOUNCE, text=text, **kwargs)
+    
+    return await send_animation_cached(
+        partial(dm_fanout.send, bot.send_animation, chat_id, PRIORITY_ANNOUNCE),
+        send_text,
+        gif_key,
+        text
+    )
+
+async def send_private_post(bot, chat_id, text, gif_key=None):
+    """Deliver a queued private result"""
+    try:
+        message = await dm_fanout.send(bot.send_message, chat_id, PRIORITY_RESULT, text=text, parse_mode='Markdown')
+    except Exception as e:
+        dm_reachability.observe(chat_id, e)
+        raise
+    dm_reachability.observe(chat_id, message)
+    return message
+
+def announce(context, game, gif_key, text):
+    """Queue a phase announcement with its GIF for the game's group chat"""
+    outbox.post(game.group_chat_id, PRIORITY_ANNOUNCE, text,
+                partial(send_group_post, context.bot, game.group_chat_id), gif_key)
+
+def tell_player(context, player_id, text):
+    """Queue a private message (role, vision, ...) for a player"""
+    if dm_reachability.is_unreachable(player_id):
+        return
+    outbox.post(player_id, PRIORITY_RESULT, text, partial(send_private_post, context.bot, player_id))
+
+def name_lines(lines, limit=LIST_LIMIT):
+    """Join announcement lines, folding the ones past `limit` into a count so captions stay short"""
+    if len(lines) <= limit:
+        return "\n".join(lines)
+    return "\n".join(lines[:limit]) + f"\n• *...and {len(lines) - limit} more*"
+
+async def reply_with_animation(update, gif_key, text):
+    """Reply to a command with a phase GIF"""
+    return await send_animation_cached(update.message.reply_animation, update.message.reply_text, gif_key, text)
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Enhanced start command with full game explanation"""
+    if update.effective_chat.type == 'private':
+        # Starting the private chat is exactly what makes a user reachable
+        dm_reachability.mark(update.effective_user.id, True)
     welcome_text = """
 🌌 **SHADOW COURT: THE SECRET COUNCIL**
 *The Ultimate Fantasy Social Deduction Game*
 
 **🎮 QUICK START:**
-• `/join` - Join the waiting list (4-10 players)
+• `/join` - Join the waiting list (4-50 players)
+• `/gather 30` - Host: hold the lobby open for a big court
 • `/rules` - Complete game rules & roles
 • `/status` - Current game state & players
+• `/stats` - Your record in the Shadow Court
 • `/help` - All available commands
 
 **⚔️ EPIC GAME FLOW:**
 1️⃣ **Join Phase**: Players gather with `/join`
-2️⃣ **Auto-Start**: Game begins at 4+ players  
+2️⃣ **Auto-Start**: Game begins at 4+ players, or at the host's `/gather` size  
 3️⃣ **Role Assignment**: Secret roles via DM
 4️⃣ **Automated Phases**:
    🌙 **Moonlight** (30s) - Special roles act in shadows
@@ -160,7 +265,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 **🌟 SPECIAL FEATURES:**
 • 🔒 **Anonymous Voting** - No vote pressure
-• 🎭 **8 Unique Fantasy Roles** - Scalable 4-10 players
+• 🎭 **8 Unique Fantasy Roles** - Scalable 4-50 players
 • 🎬 **Cinematic GIFs** - Immersive phase visuals
 • 🤖 **Fully Automated** - No human host needed
 • ⚡ **Fast-Paced** - 2-minute phases keep excitement
@@ -168,14 +273,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 Ready to enter the Shadow Court? Type `/join` now! ⚔️
     """
     
-    try:
-        await update.message.reply_animation(
-            animation=PHASE_GIFS['gathering'],
-            caption=welcome_text,
-            parse_mode='Markdown'
-        )
-    except Exception:
-        await update.message.reply_text(welcome_text, parse_mode='Markdown')
+    await reply_with_animation(update, 'gathering', welcome_text)
 
 async def rules_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Complete rules explanation with all roles"""
@@ -223,6 +321,7 @@ async def rules_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • **6-7 players**: Trickster added  
 • **8+ players**: Advanced roles activated
 • **10 players**: Full role complexity
+• **11-50 players**: Every role scales with the court
 
 **🔥 WINNING STRATEGIES:**
 • **Good**: Use Oracle info, protect key players
@@ -244,9 +343,13 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • `/rules` - Complete rules & all roles  
 • `/join` - Join the waiting list
 • `/status` - Detailed game status
+• `/stats` - Your wins, survivals & best roles
+• `/leaderboard` - Top players in this group
 • `/help` - This comprehensive guide
 
 **⚙️ GAME MANAGEMENT:**
+• `/gather <n>` - Host (first to join): wait for n players before starting
+• `/begin` - Host: start a gathering lobby now (4+ players)
 • `/endgame` - Force end current game
 • `/players` - List all joined players
 • `/roles` - Quick role reference
@@ -258,7 +361,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • Use `/status` to see current phase & players
 
 **📊 GAME INFORMATION:**
-• **Players**: 4-10 supported (auto-scaling roles)
+• **Players**: 4-50 supported (auto-scaling roles)
 • **Duration**: ~10-20 minutes per game
 • **Phases**: Auto-timed (30s night, 45s voting)
 • **Hosting**: Fully automated (no host needed)
@@ -272,7 +375,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • **🃏 Trickster**: Swap votes (once)
 
 **🆘 TROUBLESHOOTING:**
-• **No DM buttons?** Start private chat with bot first
+• **Can't join / no DM buttons?** Start private chat with bot first
 • **Game stuck?** Use `/endgame` to reset
 • **Missing players?** Check `/status` for current list
 
@@ -287,6 +390,49 @@ The Shadow Court awaits your mastery! 🌌⚔️
     
     await update.message.reply_text(help_text, parse_mode='Markdown')
 
+async def refuse_join(update, context, chat_id):
+    """Reply and return True if the user can't take a seat in the group's court right now"""
+    user = update.effective_user
+    # Asked first: nothing may await between the last check below and seating the player
+    seated_elsewhere = await peer_seats.seat(user.id)
+    game = sessions.get(chat_id)
+    
+    if game is not None and game.game_active:
+        alive_count = game.count_alive()
+        await update.message.reply_text(
+            f"❌ **Game In Progress!**\n\n"
+            f"🎮 Current Phase: **{game.phase.title()}**\n"
+            f"👥 Players Alive: **{alive_count}**\n"
+            f"📅 Day: **{game.day_number}**\n\n"
+            f"⏳ Wait for this game to end, then join the next one!"
+        )
+        return True
+        
+    if game is not None and user.id in game.players:
+        await update.message.reply_text(f"✅ **{user.first_name}**, you're already in the Shadow Court!")
+        return True
+    
+    if not context.application.running:
+        # Shutting down for a restart; the lobby is saved and resumes with the next instance
+        await update.message.reply_text(
+            "🔧 **The Shadow Court is restarting!**\n\nTry `/join` again in a few seconds."
+        )
+        return True
+    
+    if game is not None and len(game.players) >= MAX_PLAYERS:
+        await update.message.reply_text(
+            f"❌ **The Shadow Court is full!**\n\n👥 {MAX_PLAYERS} players is the limit. Join the next game!"
+        )
+        return True
+    
+    if player_sessions.get(user.id, seated_elsewhere or chat_id) != chat_id:
+        await update.message.reply_text(
+            f"❌ **{user.first_name}**, you're already playing in another Shadow Court!\n\n"
+            f"⏳ Finish that game first, then join this one."
+        )
+        return True
+    return False
+
 async def join_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Enhanced join with player management"""
     if update.effective_chat.type == 'private':
@@ -297,80 +443,134 @@ async def join_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
         
     user = update.effective_user
+    chat_id = update.effective_chat.id
+    if await refuse_join(update, context, chat_id):
+        return
     
-    if game.game_active:
-        alive_count = len(game.get_alive_players())
+    if await dm_reachability.check(dm_fanout, context.bot, user.id) is False:
         await update.message.reply_text(
-            f"❌ **Game In Progress!**\n\n"
-            f"🎮 Current Phase: **{game.phase.title()}**\n"
-            f"👥 Players Alive: **{alive_count}**\n"
-            f"📅 Day: **{game.day_number}**\n\n"
-            f"⏳ Wait for this game to end, then join the next one!"
+            f"📭 **{user.first_name}**, I can't send you private messages yet!\n\n"
+            f"Open a private chat with @{context.bot.username}, press **Start**, then `/join` again here.\n\n"
+            f"💡 Your secret role and action buttons are delivered by DM."
         )
         return
-        
-    if user.id in game.players:
-        await update.message.reply_text(f"✅ **{user.first_name}**, you're already in the Shadow Court!")
+    
+    # Updates run concurrently and the probe can wait out rate limits: the game may have
+    # started, filled up or seated this user (here or in another group) in the meantime
+    if await refuse_join(update, context, chat_id):
         return
-        
-    # Add player with enhanced data
-    game.players[user.id] = {
-        'name': user.first_name,
-        'username': user.username or user.first_name,
-        'role': None,
-        'alive': True,
-        'protected': False,
-        'join_time': datetime.now()
-    }
     
-    game.group_chat_id = update.effective_chat.id
+    # Add player with enhanced data; a session is only created once someone is seated
+    game = get_game(chat_id)
+    if game.game_id is None:
+        game.game_id = uuid.uuid4().hex
+        game.seed = secrets.randbits(64)
+        event_log.begin(game)
+    engine.add_player(game, user.id, user.first_name, user.username)
+    event_log.record(game, 'join', user.id, user.first_name, user.username,
+                     game.players[user.id].join_time.isoformat())
+    
+    player_sessions[user.id] = game.group_chat_id
+    session_store.save(game)
     player_count = len(game.players)
     
+    # Armed before the reply: a rate-limited send must not leave the lobby without a timer
+    if player_count >= lobby_size(game):
+        # Auto-start with minimum players, or once a host's /gather size is reached;
+        # later joins restart the countdown
+        schedule_phase(context, game, LOBBY_COUNTDOWN, start_game)
+    else:
+        # A lobby that never fills is cleared instead of held in memory forever
+        schedule_phase(context, game, LOBBY_IDLE_TIMEOUT, expire_lobby)
+    
     # Enhanced join message
     join_message = f"""
 👑 **{user.first_name}** enters the Shadow Court!
 
 **📊 Court Status:**
-👥 **Players**: {player_count}/10
-🎯 **Status**: {'🎮 Ready to Begin!' if player_count >= 4 else f'⏳ Need {4-player_count} more players'}
+👥 **Players**: {player_count}/{MAX_PLAYERS}
+🎯 **Status**: {'🎮 Ready to Begin!' if player_count >= lobby_size(game) else f'⏳ Need {lobby_size(game) - player_count} more players'}
 
 **📋 Current Players:**
-{chr(10).join([f"• {p['name']}" for p in game.players.values()])}
+{name_lines([f"• {p.name}" for p in game.players.values()])}
 
-{'🚀 **Game will auto-start in 5 seconds!**' if player_count >= 4 else '📢 **Invite more players to begin the ritual!**'}
+{f'🚀 **Game will auto-start in {LOBBY_COUNTDOWN} seconds!**' if player_count >= lobby_size(game) else '📢 **Invite more players to begin the ritual!**'}
     """
     
+    await reply_with_animation(update, 'gathering', join_message)
+
+async def find_hosted_lobby(update):
+    """The group's lobby if the caller is its host (first to join), replying with why not otherwise"""
+    game = find_game(update) if update.effective_chat.type != 'private' else None
+    if game is None or game.game_active or not game.players:
+        await update.message.reply_text("❌ **No Lobby**\n\nType `/join` to gather a new court first!")
+        return None
+    host_id = next(iter(game.players))
+    if update.effective_user.id != host_id:
+        await update.message.reply_text(f"👑 Only the host, **{game.players[host_id].name}**, can do that.")
+        return None
+    return game
+
+async def gather_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Hold the lobby open until a host-chosen number of players has joined"""
+    game = await find_hosted_lobby(update)
+    if game is None:
+        return
     try:
-        await update.message.reply_animation(
-            animation=PHASE_GIFS['gathering'],
-            caption=join_message,
-            parse_mode='Markdown'
+        target = int(context.args[0])
+    except (IndexError, ValueError):
+        await update.message.reply_text(
+            f"📯 **Usage:** `/gather <players>`\n\nThe game waits until that many have joined "
+            f"({MIN_PLAYERS}-{MAX_PLAYERS}). `/begin` starts it early."
         )
-    except Exception:
-        await update.message.reply_text(join_message, parse_mode='Markdown')
+        return
+    
+    game.lobby_target = min(max(target, MIN_PLAYERS), MAX_PLAYERS)
+    player_count = len(game.players)
+    if player_count >= game.lobby_target:
+        schedule_phase(context, game, LOBBY_COUNTDOWN, start_game)
+    else:
+        # Replaces a running countdown; each /join pushes the idle expiry back
+        schedule_phase(context, game, LOBBY_IDLE_TIMEOUT, expire_lobby)
+    
+    await update.message.reply_text(
+        f"📯 **The Shadow Court gathers!**\n\n"
+        f"👥 Waiting for **{game.lobby_target}** players ({player_count} so far).\n"
+        f"🚀 The host can `/begin` early once {MIN_PLAYERS} have joined."
+    )
+
+async def begin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Start a gathering lobby now instead of waiting for its /gather size"""
+    game = await find_hosted_lobby(update)
+    if game is None:
+        return
+    if len(game.players) < MIN_PLAYERS:
+        await update.message.reply_text(
+            f"⏳ **Not yet!**\n\nThe court needs at least {MIN_PLAYERS} players, {len(game.players)} have joined."
+        )
+        return
     
-    # Auto-start with minimum players
-    if player_count >= 4 and not game.game_active:
-        # Give players a moment to see the message
-        await asyncio.sleep(5)
-        await start_game(context)
+    game.lobby_target = None  # Later joins restart the countdown instead of holding the lobby again
+    schedule_phase(context, game, LOBBY_COUNTDOWN, start_game)
+    await update.message.reply_text(f"🚀 **The ritual begins in {LOBBY_COUNTDOWN} seconds!**")
 
 async def players_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """List all players with enhanced info"""
-    if not game.players:
+    game = find_game(update)
+    if game is None or not game.players:
         await update.message.reply_text("👥 **No Players**\n\nType `/join` to enter the Shadow Court!")
         return
     
     player_list = "👥 **SHADOW COURT ROSTER**\n\n"
     
     for i, (pid, pdata) in enumerate(game.players.items(), 1):
-        status = "💀 Dead" if not pdata['alive'] else ("🛡️ Protected" if pdata.get('protected') else "⚔️ Alive")
-        player_list += f"{i}. **{pdata['name']}** - {status}\n"
+        status = "💀 Dead" if not pdata.alive else ("🛡️ Protected" if pdata.protected else "⚔️ Alive")
+        player_list += f"{i}. **{pdata.name}** - {status}\n"
     
     player_list += f"\n📊 **Total**: {len(game.players)} players"
     
     if game.game_active:
-        alive_count = len(game.get_alive_players())
+        alive_count = game.count_alive()
         player_list += f"\n💓 **Alive**: {alive_count}"
         player_list += f"\n📅 **Day**: {game.day_number}"
         player_list += f"\n🎭 **Phase**: {game.phase.title()}"
@@ -401,14 +601,69 @@ Use `/rules` for complete details!
     
     await update.message.reply_text(roles_text, parse_mode='Markdown')
 
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """A player's lifetime record from the stats store"""
+    user = update.effective_user
+    record = await stats_store.player(user.id)
+    if record is None:
+        await update.message.reply_text(
+            f"📜 **{user.first_name}**, the court has no record of you yet!\n\n"
+            f"Finish a game and your deeds will be written here. Type `/join` to begin!"
+        )
+        return
+    
+    games = record['games']
+    role_lines = [
+        f"• {ROLES[role]['name'] if role in ROLES else role}: {wins}/{played} won"
+        for role, played, wins in record['roles'][:5]
+    ]
+    stats_text = f"""
+📜 **{record['name'].upper()}'S COURT RECORD**
+
+🎮 **Games Played:** {games}
+🏆 **Victories:** {record['wins']} ({100 * record['wins'] // games}%)
+💓 **Survived:** {record['survived']} ({100 * record['survived'] // games}%)
+
+**🎭 Most Played Roles:**
+{chr(10).join(role_lines)}
+
+*Every game is remembered by the Shadow Court...*
+    """
+    
+    await update.message.reply_text(stats_text, parse_mode='Markdown')
+
+async def leaderboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Top players by wins in this group, or across all groups in a private chat"""
+    in_group = update.effective_chat.type != 'private'
+    leaders = await stats_store.leaderboard(update.effective_chat.id if in_group else None)
+    if not leaders:
+        await update.message.reply_text("🏆 **No Champions Yet**\n\nFinish a game to claim the first place!")
+        return
+    
+    medals = ['🥇', '🥈', '🥉']
+    lines = [
+        f"{medals[i] if i < len(medals) else f'{i + 1}.'} **{name}** - {wins} wins in {games} games"
+        for i, (name, games, wins) in enumerate(leaders)
+    ]
+    leaderboard_text = f"""
+🏆 **{'COURT CHAMPIONS' if in_group else 'CHAMPIONS OF ALL COURTS'}**
+
+{chr(10).join(lines)}
+
+*Glory to the victors of the Shadow Court!*
+    """
+    
+    await update.message.reply_text(leaderboard_text, parse_mode='Markdown')
+
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Enhanced status with full game information"""
-    if not game.players:
+    game = find_game(update)
+    if game is None or not game.players:
         status_text = """
 🌌 **SHADOW COURT STATUS**
 
 **🎭 Game State:** No active session
-**👥 Players:** 0/10  
+**👥 Players:** 0/50  
 **📍 Phase:** Waiting for players
 
 **🚀 How to Start:**
@@ -423,12 +678,12 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
     # Enhanced status for active games
     alive_players = game.get_alive_players()
-    dead_players = {pid: pdata for pid, pdata in game.players.items() if not pdata['alive']}
+    dead_players = {pid: pdata for pid, pdata in game.players.items() if not pdata.alive}
     
     # Count teams
-    good_alive = len(game.get_players_by_team('good'))
-    evil_alive = len(game.get_players_by_team('evil'))
-    neutral_alive = len(game.get_players_by_team('neutral'))
+    good_alive = game.count_alive('good')
+    evil_alive = game.count_alive('evil')
+    neutral_alive = game.count_alive('neutral')
     
     status_text = f"""
 🌌 **SHADOW COURT STATUS**
@@ -436,7 +691,7 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 **🎭 Game State:** {'🎮 Active Battle' if game.game_active else '⏳ Preparing'}
 **📅 Day Number:** {game.day_number}
 **🎯 Current Phase:** **{game.phase.title()}**
-**👥 Total Players:** {len(game.players)}/10
+**👥 Total Players:** {len(game.players)}/{MAX_PLAYERS}
 
 **⚔️ TEAM BALANCE:**
 👑 Good: **{good_alive}** alive
@@ -444,10 +699,10 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 🃏 Neutral: **{neutral_alive}** alive
 
 **👥 ALIVE PLAYERS ({len(alive_players)}):**
-{chr(10).join([f"• {p['name']}" for p in alive_players.values()])}
+{chr(10).join([f"• {p.name}" for p in alive_players.values()])}
 
 **💀 FALLEN HEROES ({len(dead_players)}):**
-{chr(10).join([f"• {p['name']} ({ROLES.get(p.get('role', 'unknown'), {}).get('name', 'Unknown Role')})" for p in dead_players.values()]) if dead_players else "None yet"}
+{chr(10).join([f"• {p.name} ({ROLES.get(p.role, {}).get('name', 'Unknown Role')})" for p in dead_players.values()]) if dead_players else "None yet"}
 
 **🎯 CURRENT OBJECTIVE:**
 {get_phase_description(game.phase)}
@@ -470,13 +725,14 @@ def get_phase_description(phase):
 
 async def endgame_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Enhanced endgame with statistics"""
-    if not game.game_active:
+    game = find_game(update)
+    if game is None or not game.game_active:
         await update.message.reply_text("❌ **No Active Game**\n\nThere's no game to end right now!")
         return
     
     # Game statistics
     total_players = len(game.players)
-    survivors = len(game.get_alive_players())
+    survivors = game.count_alive()
     casualties = total_players - survivors
     
     endgame_text = f"""
@@ -493,73 +749,45 @@ async def endgame_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 🎮 **Ready for another round?** Type `/join`!
     """
     
-    game.reset()
+    end_session(game, 'ended', drop_pending=True)
     
-    try:
-        await update.message.reply_animation(
-            animation=PHASE_GIFS['banishment'],
-            caption=endgame_text,
-            parse_mode='Markdown'
-        )
-    except Exception:
-        await update.message.reply_text(endgame_text, parse_mode='Markdown')
+    await reply_with_animation(update, 'banishment', endgame_text)
 
-async def start_game(context):
-    """Enhanced game start with full role assignment"""
-    if len(game.players) < 4:
+async def expire_lobby(context, game):
+    """Disband a lobby that went LOBBY_IDLE_TIMEOUT without reaching the minimum"""
+    if game.game_active:
         return
-        
-    game.game_active = True
-    game.phase = "convening"
-    game.day_number = 1
-    game.phase_start_time = datetime.now()
-    
-    # Advanced role assignment
-    player_ids = list(game.players.keys())
-    roles = get_role_distribution(len(player_ids))
-    random.shuffle(roles)
-    
-    # Assign roles with validation
-    for i, player_id in enumerate(player_ids):
-        game.players[player_id]['role'] = roles[i]
-        game.players[player_id]['protected'] = False
-        
-    # Send detailed role DMs
-    for player_id, player_data in game.players.items():
-        role_key = player_data['role']
-        role_info = ROLES[role_key]
-        
-        role_message = f"""
-🌟 **YOUR SHADOW COURT ROLE**
-
-**🎭 Role:** {role_info['name']}
-**📜 Description:** {role_info['description']}
-**⚔️ Team:** {role_info['team'].title()}
-**🎯 Win Condition:** {role_info['win_condition']}
+    if len(game.players) >= lobby_size(game):
+        # Filled without its countdown being armed; start it rather than leave the lobby untimed
+        schedule_phase(context, game, LOBBY_COUNTDOWN, start_game)
+        return
+    announce(context, game, 'banishment', f"""
+🌫️ **THE SHADOW COURT DISBANDS**
 
-{'🌙 **Night Actions:** You will receive action buttons during night phases.' if role_info['action'] else '⚖️ **Trial Actions:** You vote during trial phases only.'}
+Not enough players answered the call within {LOBBY_IDLE_TIMEOUT // 60} minutes.
 
-**🔒 CRITICAL:** Keep your role absolutely secret!
-**💡 Strategy:** {get_role_strategy(role_key)}
+🎮 Type `/join` to gather a new court!
+    """)
+    end_session(game, 'expired')
 
-🌌 **Welcome to the Shadow Court, {player_data['name']}!**
-        """
+async def start_game(context, game):
+    """Enhanced game start with full role assignment"""
+    if len(game.players) < 4 or game.game_active:
+        return
+    game.lobby_target = None  # A lobby setting; replays never see it, so it must not reach the digests
         
-        try:
-            await context.bot.send_message(
-                chat_id=player_id,
-                text=role_message,
-                parse_mode='Markdown'
-            )
-        except Exception as e:
-            logger.error(f"Failed to send role DM to {player_id}: {e}")
+    # Advanced role assignment
+    events = enter_phase(game, "convening")
+    event_log.record(game, 'roles', [[event.player_id, event.role] for event in events])
     
-    # Enhanced game start announcement
+    # Send detailed role DMs
     team_counts = {}
-    for player_data in game.players.values():
-        team = ROLES[player_data['role']]['team']
-        team_counts[team] = team_counts.get(team, 0) + 1
+    for event in events:
+        player_data = game.players[event.player_id]
+        team_counts[player_data.team] = team_counts.get(player_data.team, 0) + 1
+        tell_player(context, event.player_id, ROLE_DM_TEMPLATES[event.role].format(name=player_data.name))
     
+    # Enhanced game start announcement
     start_message = f"""
 ⚔️ **THE SHADOW COURT CONVENES!**
 
@@ -574,23 +802,10 @@ async def start_game(context):
 *The ritual of shadows begins...*
     """
     
-    try:
-        await context.bot.send_animation(
-            chat_id=game.group_chat_id,
-            animation=PHASE_GIFS['convening'],
-            caption=start_message,
-            parse_mode='Markdown'
-        )
-    except Exception:
-        await context.bot.send_message(
-            chat_id=game.group_chat_id,
-            text=start_message,
-            parse_mode='Markdown'
-        )
+    announce(context, game, 'convening', start_message)
     
     # Start first night phase with delay
-    await asyncio.sleep(10)
-    await start_night_phase(context)
+    schedule_phase(context, game, CONVENING_DURATION, start_night_phase)
 
 def get_role_strategy(role_key):
     """Get strategy tips for each role"""
@@ -606,21 +821,51 @@ def get_role_strategy(role_key):
     }
     return strategies.get(role_key, 'Play strategically and trust your instincts')
 
-async def start_night_phase(context):
-    """Enhanced night phase with full role interactions"""
-    if not game.game_active:
-        return
-        
-    game.phase = "night" 
-    game.night_actions = {}
-    game.phase_start_time = datetime.now()
-    
-    # Clear protections from previous night
-    for player_data in game.players.values():
-        player_data['protected'] = False
-    
-    night_message = f"""
-🌙 **NIGHT {game.day_number} DESCENDS** (30 seconds)
+def render_role_dm(role_key):
+    """Role DM text with a {name} placeholder for the player"""
+    role_info = ROLES[role_key]
+    return f"""
+🌟 **YOUR SHADOW COURT ROLE**
+
+**🎭 Role:** {role_info['name']}
+**📜 Description:** {role_info['description']}
+**⚔️ Team:** {role_info['team'].title()}
+**🎯 Win Condition:** {role_info['win_condition']}
+
+{'🌙 **Night Actions:** You will receive action buttons during night phases.' if role_info['action'] else '⚖️ **Trial Actions:** You vote during trial phases only.'}
+
+**🔒 CRITICAL:** Keep your role absolutely secret!
+**💡 Strategy:** {get_role_strategy(role_key)}
+
+🌌 **Welcome to the Shadow Court, {{name}}!**
+        """
+
+def render_night_action_dm(role_key):
+    """Night action prompt for a role; the same for every player holding it"""
+    role_info = ROLES[role_key]
+    action_descriptions = {
+        'kill': 'Choose a player to eliminate tonight',
+        'investigate': 'Choose a player to learn their team alignment',
+        'protect': 'Choose a player to protect from death (including yourself)',
+        'dayshoot': 'You have a one-time day kill ability',
+        'cancel_votes': 'You can cancel all votes once during any trial',
+        'commune': 'Speak with the dead to learn secrets'
+    }
+    return f"""
+🌙 **NIGHT ACTION: {role_info['name']}**
+
+**🎯 Your Power:** {role_info['description']}
+**⚡ Action:** {action_descriptions.get(role_info['action'], 'Use your special ability')}
+
+⏰ **You have 30 seconds to choose:**
+        """
+
+# Per-player messages are rendered once here and only have names and counts filled in per phase
+ROLE_DM_TEMPLATES = {role_key: render_role_dm(role_key) for role_key in ROLES}
+NIGHT_ACTION_DMS = {role_key: render_night_action_dm(role_key) for role_key, info in ROLES.items() if info['action']}
+
+NIGHT_ANNOUNCEMENT = """
+🌙 **NIGHT {day} DESCENDS** (30 seconds)
 
 *The Shadow Court sleeps, but evil never rests...*
 
@@ -634,206 +879,217 @@ async def start_night_phase(context):
 
 ⏰ *Actions resolve automatically in 30 seconds*
     """
+
+TRIAL_ANNOUNCEMENT = """
+⚖️ **TRIAL OF DAY {day}** (45 seconds)
+
+*The Shadow Court convenes to render judgment!*
+
+👥 **{alive} members** must decide who faces exile
+🗳️ **Secret voting** ensures pure judgment
+⚖️ **Majority rules** - most votes determines fate
+🎲 **Ties broken randomly** by the fates
+
+**🔥 Remember:** 
+• Vote wisely - appearances deceive
+• Dead cannot return to testify  
+• Your vote is completely anonymous
+• Skip voting if uncertain
+
+**All living members:** Check your DM to cast judgment!
+
+⏰ *Voting closes automatically in 45 seconds*
+    """
+
+VOTE_DM_TEMPLATE = """
+⚖️ **SECRET TRIAL VOTE**
+
+**🏛️ You are:** {name}
+**⚔️ Court Members:** {alive} alive
+**🎯 Your Mission:** Identify and exile threats
+
+**🗳️ Cast your judgment:**
+*Choose wisely - this vote is completely anonymous*
+
+**💡 Voting Strategy:**
+• Consider recent behavior patterns
+• Trust your investigation results  
+• Watch for defensive reactions
+• Remember: innocents can act suspicious too
+
+⏰ **Time remaining: 45 seconds**
+
+*The fate of the Shadow Court rests in your hands...*
+        """
+
+def layout_keyboard(game, buttons, skip, page=0):
+    """Arrange one page of target buttons two per row, then page controls and the skip option"""
+    # A lone leftover button rides on the last page rather than getting a page to itself
+    pages = max(1, -(-(len(buttons) - 1) // KEYBOARD_PAGE_SIZE))
+    if pages == 1:
+        buttons = [*buttons, skip]
+        return InlineKeyboardMarkup([buttons[i:i + 2] for i in range(0, len(buttons), 2)])
+    
+    page = min(max(page, 0), pages - 1)
+    buttons = buttons[page * KEYBOARD_PAGE_SIZE:None if page == pages - 1 else (page + 1) * KEYBOARD_PAGE_SIZE]
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(f"◀️ {page}/{pages}",
+                                               callback_data=callbacks.encode(game, 'page', page - 1)))
+    if page < pages - 1:
+        navigation.append(InlineKeyboardButton(f"{page + 2}/{pages} ▶️",
+                                               callback_data=callbacks.encode(game, 'page', page + 1)))
+    return InlineKeyboardMarkup([*(buttons[i:i + 2] for i in range(0, len(buttons), 2)), navigation, [skip]])
+
+def night_button(game, action_type, target_id):
+    return InlineKeyboardButton(f"🎯 {game.players[target_id].name}",
+                                callback_data=callbacks.encode(game, action_type, target_id))
+
+def vote_button(game, target_id):
+    return InlineKeyboardButton(f"🗳️ Exile {game.players[target_id].name}",
+                                callback_data=callbacks.encode(game, 'vote', target_id))
+
+def skip_button(game):
+    label = "⏭️ Skip Action" if game.phase == "night" else "⏭️ Skip Vote"
+    return InlineKeyboardButton(label, callback_data=callbacks.encode(game, 'skip'))
+
+def player_keyboard(game, player_id, page):
+    """One page of a player's buttons for the current night or trial"""
+    if game.phase == "night":
+        action_type = game.players[player_id].action
+        buttons = [night_button(game, action_type, target_id) for target_id in engine.night_targets(game, player_id)]
+    else:
+        buttons = [vote_button(game, target_id) for target_id in engine.vote_targets(game, player_id)]
+    return layout_keyboard(game, buttons, skip_button(game), page)
+
+async def start_night_phase(context, game):
+    """Enhanced night phase with full role interactions"""
+    if not game.game_active:
+        return
+        
+    enter_phase(game, "night")
     
-    try:
-        await context.bot.send_animation(
-            chat_id=game.group_chat_id,
-            animation=PHASE_GIFS['moonlight'],
-            caption=night_message,
-            parse_mode='Markdown'
-        )
-    except Exception:
-        await context.bot.send_message(
-            chat_id=game.group_chat_id,
-            text=night_message,
-            parse_mode='Markdown'
-        )
+    announce(context, game, 'moonlight', NIGHT_ANNOUNCEMENT.format(day=game.day_number))
     
     # Send enhanced night action DMs
-    await send_night_action_dms(context)
+    await send_night_action_dms(context, game)
     
-    # Auto-resolve after 30 seconds
-    await asyncio.sleep(30)
-    await start_dawn_phase(context)
+    # Auto-resolve after 30 seconds, or right away if everyone already acted
+    delay = EARLY_RESOLUTION_GRACE if all_submitted(game) else NIGHT_DURATION
+    schedule_phase(context, game, delay, start_dawn_phase)
 
-async def send_night_action_dms(context):
+async def send_night_action_dms(context, game):
     """Enhanced night actions with all role abilities"""
-    alive_players = game.get_alive_players()
-    
-    for player_id, player_data in alive_players.items():
-        role_key = player_data['role']
-        role_info = ROLES.get(role_key, {})
-        
-        if not role_info.get('action'):
+    action_dms = {}
+    buttons = {}  # {(action_type, target_id): button}, shared by everyone with that action
+    keyboards = {}  # {(action_type, target_ids): markup}; most roles see identical target lists
+    skip = skip_button(game)
+    
+    for player_id, player_data in game.get_alive_players().items():
+        action_type = player_data.action
+        if not action_type or dm_reachability.is_unreachable(player_id):
             continue
-            
-        # Create enhanced target buttons
-        targets = []
-        action_type = role_info['action']
-        
-        for target_id, target_data in alive_players.items():
-            # Role-specific targeting rules
-            if action_type == 'kill' and target_id == player_id:
-                continue  # Can't kill self
-            elif action_type in ['protect', 'investigate']:
-                # Can target anyone including self for protection
-                pass
-            
-            targets.append(InlineKeyboardButton(
-                f"🎯 {target_data['name']}", 
-                callback_data=f"night_{action_type}_{target_id}"
-            ))
-        
-        # Add skip option for all roles
-        targets.append(InlineKeyboardButton("⏭️ Skip Action", callback_data="night_skip"))
         
-        # Arrange buttons in optimal layout
-        keyboard = []
-        for i in range(0, len(targets), 2):
-            row = targets[i:i+2]
-            keyboard.append(row)
+        targets = tuple(engine.night_targets(game, player_id))
+        keyboard = keyboards.get((action_type, targets))
+        if keyboard is None:
+            for target_id in targets:
+                if (action_type, target_id) not in buttons:
+                    buttons[action_type, target_id] = night_button(game, action_type, target_id)
+            keyboard = keyboards[action_type, targets] = layout_keyboard(
+                game, [buttons[action_type, target_id] for target_id in targets], skip
+            )
         
-        # Enhanced action descriptions
-        action_descriptions = {
-            'kill': 'Choose a player to eliminate tonight',
-            'investigate': 'Choose a player to learn their team alignment',
-            'protect': 'Choose a player to protect from death (including yourself)',
-            'dayshoot': 'You have a one-time day kill ability',
-            'cancel_votes': 'You can cancel all votes once during any trial',
-            'commune': 'Speak with the dead to learn secrets'
+        action_dms[player_id] = {
+            'text': NIGHT_ACTION_DMS[player_data.role],
+            'reply_markup': keyboard,
+            'parse_mode': 'Markdown'
         }
-        
-        action_text = f"""
-🌙 **NIGHT ACTION: {role_info['name']}**
-
-**🎯 Your Power:** {role_info['description']}
-**⚡ Action:** {action_descriptions.get(action_type, 'Use your special ability')}
-
-⏰ **You have 30 seconds to choose:**
-        """
-        
-        try:
-            await context.bot.send_message(
-                chat_id=player_id,
-                text=action_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
-        except Exception as e:
-            logger.error(f"Failed to send night action DM to {player_id}: {e}")
-
-async def start_dawn_phase(context):
+    
+    # Only players who actually got buttons that do something tonight are waited on; day
+    # abilities and a Spiritwalker with no dead only get Skip. Logged before the fan-out
+    # too, since a game can end while a large court's DMs are still going out
+    game.expected_actors = {player_id for player_id in action_dms if engine.acts_at_night(game, player_id)}
+    expected = len(game.expected_actors)
+    event_log.record(game, 'expect', sorted(game.expected_actors))
+    results = await action_panels.show_many(context.bot, action_dms)
+    for player_id, result in results.items():
+        dm_reachability.observe(player_id, result)
+        if isinstance(result, Exception):
+            logger.error(f"Failed to send night action DM to {player_id}: {result}")
+            game.expected_actors.discard(player_id)
+    if len(game.expected_actors) < expected:
+        event_log.record(game, 'expect', sorted(game.expected_actors))
+    return results
+
+async def start_dawn_phase(context, game):
     """Enhanced dawn phase with detailed event processing"""
     if not game.game_active:
         return
         
-    game.phase = "dawn"
-    game.phase_start_time = datetime.now()
-    
-    # Process all night actions with enhanced logic
-    killed_players = []
-    protected_players = []
-    investigation_results = {}
-    
-    # Get all actions
-    kills = game.night_actions.get('kill', {})
-    protections = game.night_actions.get('protect', {})
-    investigations = game.night_actions.get('investigate', {})
-    
-    # Process protections first
-    protected_ids = list(protections.values())
-    for target_id in protected_ids:
-        if target_id in game.players:
-            game.players[target_id]['protected'] = True
-            protected_players.append(game.players[target_id])
-    
-    # Process kills with protection checks
-    for killer_id, target_id in kills.items():
-        if target_id in game.players and game.players[target_id]['alive']:
-            if not game.players[target_id].get('protected', False):
-                game.players[target_id]['alive'] = False
-                killed_players.append(game.players[target_id])
-    
-    # Process investigations with enhanced results
-    for investigator_id, target_id in investigations.items():
-        if target_id in game.players:
-            target_role = game.players[target_id]['role']
-            target_team = ROLES.get(target_role, {}).get('team', 'unknown')
-            investigation_results[investigator_id] = {
-                'target': game.players[target_id],
-                'team': target_team,
-                'role_hint': get_investigation_hint(target_role)
-            }
+    # Resolve all night actions in the rule engine
+    events = enter_phase(game, "dawn")
+    killed = [event for event in events if isinstance(event, engine.PlayerKilled)]
+    saved = [event for event in events if isinstance(event, engine.PlayerSaved)]
+    investigations = [event for event in events if isinstance(event, engine.Investigated)]
+    communions = [event for event in events if isinstance(event, engine.Communed)]
     
     # Create dramatic dawn message
     dawn_messages = [f"☀️ **DAWN OF DAY {game.day_number}**\n"]
     dawn_messages.append("*As sunlight pierces the shadow realm...*\n")
     
-    if killed_players:
+    if killed:
         dawn_messages.append("💀 **THE NIGHT CLAIMS VICTIMS:**")
-        for player in killed_players:
-            role_name = ROLES.get(player['role'], {}).get('name', 'Unknown')
-            dawn_messages.append(f"🗡️ **{player['name']}** has fallen! (Role: {role_name})")
+        dawn_messages.append(name_lines([
+            f"🗡️ **{game.players[event.player_id].name}** has fallen! (Role: {ROLES.get(event.role, {}).get('name', 'Unknown')})"
+            for event in killed
+        ]))
     
-    if protected_players and any(p['name'] in [k['name'] for k in killed_players] for p in protected_players):
+    if saved:
         dawn_messages.append("\n🛡️ **GUARDIAN'S INTERVENTION:**")
-        for player in protected_players:
-            if any(kill_target for kill_target in kills.values() if kill_target == list(game.players.keys())[list(game.players.values()).index(player)]):
-                dawn_messages.append(f"✨ **{player['name']}** was saved from death!")
+        dawn_messages.append(name_lines([
+            f"✨ **{game.players[event.player_id].name}** was saved from death!" for event in saved
+        ]))
     
-    if not killed_players and not any(kills.values()):
+    if not killed and not saved:
         dawn_messages.append("🕊️ **A peaceful night passes...**")
         dawn_messages.append("*No blood stains the shadow realm*")
     
     # Add atmospheric flavor
-    dawn_messages.append(f"\n⚔️ **{len(game.get_alive_players())} souls remain in the court**")
+    dawn_messages.append(f"\n⚔️ **{game.count_alive()} souls remain in the court**")
     
     dawn_message = "\n".join(dawn_messages)
     
-    try:
-        await context.bot.send_animation(
-            chat_id=game.group_chat_id,
-            animation=PHASE_GIFS['dawn'],
-            caption=dawn_message,
-            parse_mode='Markdown'
-        )
-    except Exception:
-        await context.bot.send_message(
-            chat_id=game.group_chat_id,
-            text=dawn_message,
-            parse_mode='Markdown'
-        )
+    announce(context, game, 'dawn', dawn_message)
     
     # Send enhanced investigation results privately
-    for investigator_id, result in investigation_results.items():
+    for event in investigations:
         result_text = f"""
 🔮 **ORACLE'S DIVINE VISION**
 
-**🎭 Target:** {result['target']['name']}
-**⚔️ Team:** {result['team'].title()}
-**🔍 Insight:** {result['role_hint']}
+**🎭 Target:** {game.players[event.target_id].name}
+**⚔️ Team:** {event.team.title()}
+**🔍 Insight:** {get_investigation_hint(event.role)}
 
-{'✅ **This soul serves the light!**' if result['team'] == 'good' else '❌ **Darkness dwells within this one!**' if result['team'] == 'evil' else '🌀 **This soul walks a different path...**'}
+{'✅ **This soul serves the light!**' if event.team == 'good' else '❌ **Darkness dwells within this one!**' if event.team == 'evil' else '🌀 **This soul walks a different path...**'}
 
 *Use this knowledge wisely in the coming trial.*
         """
         
-        try:
-            await context.bot.send_message(
-                chat_id=investigator_id,
-                text=result_text,
-                parse_mode='Markdown'
-            )
-        except Exception as e:
-            logger.error(f"Failed to send investigation result to {investigator_id}: {e}")
+        tell_player(context, event.investigator_id, result_text)
+    
+    for event in communions:
+        role_name = ROLES.get(event.role, {}).get('name', 'Unknown')
+        tell_player(context, event.medium_id,
+                    f"👻 **WHISPERS FROM BEYOND**\n\nThe spirit of **{game.players[event.target_id].name}** "
+                    f"reveals they were the **{role_name}**.")
     
     # Check win conditions
-    if await check_win_condition(context):
+    if await check_win_condition(context, game, events):
         return
     
     # Brief pause before trial
-    await asyncio.sleep(10)
-    await start_trial_phase(context)
+    schedule_phase(context, game, DAWN_DURATION, start_trial_phase)
 
 def get_investigation_hint(role_key):
     """Get subtle hints about roles for Oracle"""
@@ -849,146 +1105,74 @@ def get_investigation_hint(role_key):
     }
     return hints.get(role_key, 'Their true nature remains hidden')
 
-async def start_trial_phase(context):
+async def start_trial_phase(context, game):
     """Enhanced trial phase with advanced voting mechanics"""
     if not game.game_active:
         return
         
-    game.phase = "trial"
-    game.votes = {}
-    game.phase_start_time = datetime.now()
+    enter_phase(game, "trial")
     
-    alive_players = game.get_alive_players()
-    
-    trial_message = f"""
-⚖️ **TRIAL OF DAY {game.day_number}** (45 seconds)
-
-*The Shadow Court convenes to render judgment!*
-
-👥 **{len(alive_players)} members** must decide who faces exile
-🗳️ **Secret voting** ensures pure judgment
-⚖️ **Majority rules** - most votes determines fate
-🎲 **Ties broken randomly** by the fates
-
-**🔥 Remember:** 
-• Vote wisely - appearances deceive
-• Dead cannot return to testify  
-• Your vote is completely anonymous
-• Skip voting if uncertain
-
-**All living members:** Check your DM to cast judgment!
-
-⏰ *Voting closes automatically in 45 seconds*
-    """
-    
-    try:
-        await context.bot.send_animation(
-            chat_id=game.group_chat_id,
-            animation=PHASE_GIFS['trial'],
-            caption=trial_message,
-            parse_mode='Markdown'
-        )
-    except Exception:
-        await context.bot.send_message(
-            chat_id=game.group_chat_id,
-            text=trial_message,
-            parse_mode='Markdown'
-        )
+    trial_message = TRIAL_ANNOUNCEMENT.format(day=game.day_number, alive=game.count_alive())
+    announce(context, game, 'trial', trial_message)
     
     # Send enhanced voting DMs
-    await send_voting_dms(context)
+    await send_voting_dms(context, game)
     
-    # Auto-resolve after 45 seconds
-    await asyncio.sleep(45)
-    await start_banishment_phase(context)
+    # Auto-resolve after 45 seconds, or right away if everyone already voted
+    delay = EARLY_RESOLUTION_GRACE if all_submitted(game) else TRIAL_DURATION
+    schedule_phase(context, game, delay, start_banishment_phase)
 
-async def send_voting_dms(context):
+async def send_voting_dms(context, game):
     """Enhanced voting interface with player information"""
     alive_players = game.get_alive_players()
     
     if len(alive_players) <= 1:
-        return
+        game.expected_actors = set()
+        event_log.record(game, 'expect', [])
+        return {}
+    
+    # One button per living player, shared by every voter's keyboard
+    buttons = {target_id: vote_button(game, target_id) for target_id in alive_players}
+    skip = skip_button(game)
     
+    vote_dms = {}
     for voter_id, voter_data in alive_players.items():
-        # Create enhanced voting buttons with player info
-        targets = []
-        for target_id, target_data in alive_players.items():
-            if target_id != voter_id:
-                # Add subtle player info to help voting decisions
-                targets.append(InlineKeyboardButton(
-                    f"🗳️ Exile {target_data['name']}", 
-                    callback_data=f"vote_{target_id}"
-                ))
-        
-        # Add skip option
-        targets.append(InlineKeyboardButton("⏭️ Skip Vote", callback_data="vote_skip"))
-        
-        # Arrange buttons optimally
-        keyboard = []
-        for i in range(0, len(targets), 2):
-            row = targets[i:i+2]
-            keyboard.append(row)
-        
-        vote_text = f"""
-⚖️ **SECRET TRIAL VOTE**
-
-**🏛️ You are:** {voter_data['name']}
-**⚔️ Court Members:** {len(alive_players)} alive
-**🎯 Your Mission:** Identify and exile threats
-
-**🗳️ Cast your judgment:**
-*Choose wisely - this vote is completely anonymous*
-
-**💡 Voting Strategy:**
-• Consider recent behavior patterns
-• Trust your investigation results  
-• Watch for defensive reactions
-• Remember: innocents can act suspicious too
-
-⏰ **Time remaining: 45 seconds**
-
-*The fate of the Shadow Court rests in your hands...*
-        """
-        
-        try:
-            await context.bot.send_message(
-                chat_id=voter_id,
-                text=vote_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
-        except Exception as e:
-            logger.error(f"Failed to send voting DM to {voter_id}: {e}")
-
-async def start_banishment_phase(context):
+        if dm_reachability.is_unreachable(voter_id):
+            continue
+        keyboard = layout_keyboard(game, [buttons[target_id] for target_id in engine.vote_targets(game, voter_id)],
+                                   skip)
+        vote_dms[voter_id] = {
+            'text': VOTE_DM_TEMPLATE.format(name=voter_data.name, alive=len(alive_players)),
+            'reply_markup': keyboard,
+            'parse_mode': 'Markdown'
+        }
+    
+    game.expected_actors = set(vote_dms)
+    event_log.record(game, 'expect', sorted(game.expected_actors))
+    results = await action_panels.show_many(context.bot, vote_dms)
+    for voter_id, result in results.items():
+        dm_reachability.observe(voter_id, result)
+        if isinstance(result, Exception):
+            logger.error(f"Failed to send voting DM to {voter_id}: {result}")
+            game.expected_actors.discard(voter_id)
+    if len(game.expected_actors) < len(vote_dms):
+        event_log.record(game, 'expect', sorted(game.expected_actors))
+    return results
+
+async def start_banishment_phase(context, game):
     """Enhanced banishment with dramatic flair and statistics"""
     if not game.game_active:
         return
         
-    game.phase = "banishment"
-    game.phase_start_time = datetime.now()
-    
-    # Enhanced vote counting with statistics
-    vote_counts = {}
-    alive_players = game.get_alive_players()
-    
-    # Initialize vote counts
-    for target_id in alive_players.keys():
-        vote_counts[target_id] = 0
-    
-    skip_votes = 0
-    
-    # Count all votes
-    for voter_id, voted_for in game.votes.items():
-        if voted_for == "skip":
-            skip_votes += 1
-        elif voted_for in vote_counts:
-            vote_counts[voted_for] += 1
-    
-    total_votes = len(game.votes)
+    # Enhanced vote counting with statistics; the day also closes here
+    events = enter_phase(game, "banishment")
+    result = events[0]
+    vote_counts = result.vote_counts
+    skip_votes = result.skipped
+    total_votes = result.total_votes
     
     # Determine exile result
-    if not vote_counts or max(vote_counts.values()) == 0:
+    if result.exiled_id is None:
         # No exile - all skipped
         banishment_message = f"""
 ⚖️ **THE COURT SHOWS MERCY**
@@ -1008,35 +1192,29 @@ async def start_banishment_phase(context):
         
     else:
         # Someone gets exiled
-        max_votes = max(vote_counts.values())
-        candidates = [pid for pid, votes in vote_counts.items() if votes == max_votes]
-        exiled_id = random.choice(candidates)
-        
-        # Update game state
-        game.players[exiled_id]['alive'] = False
-        exiled_player = game.players[exiled_id]
-        role_name = ROLES.get(exiled_player['role'], {}).get('name', 'Unknown')
-        role_team = ROLES.get(exiled_player['role'], {}).get('team', 'unknown')
+        exiled_player = game.players[result.exiled_id]
+        role_name = ROLES.get(exiled_player.role, {}).get('name', 'Unknown')
+        role_team = exiled_player.team or 'unknown'
         
         # Create detailed vote breakdown
         vote_breakdown = []
         for pid, votes in sorted(vote_counts.items(), key=lambda x: x[1], reverse=True):
             if votes > 0:
-                player_name = game.players[pid]['name']
+                player_name = game.players[pid].name
                 vote_breakdown.append(f"• **{player_name}:** {votes} vote{'s' if votes != 1 else ''}")
         
         banishment_message = f"""
 🔥 **THE COURT RENDERS JUDGMENT!**
 
 **⚖️ By majority decree:**
-**{exiled_player['name']}** is sentenced to exile!
+**{exiled_player.name}** is sentenced to exile!
 
 **🎭 REVEALED IDENTITY:**
 **Role:** {role_name}
 **Team:** {role_team.title()}
 
 📊 **Final Vote Tally:**
-{chr(10).join(vote_breakdown)}
+{name_lines(vote_breakdown)}
 • **Skipped:** {skip_votes} vote{'s' if skip_votes != 1 else ''}
 
 {'🎯 **A threat eliminated!**' if role_team == 'evil' else '💔 **An innocent falls!**' if role_team == 'good' else '🌀 **The wildcard is removed!**'}
@@ -1044,47 +1222,26 @@ async def start_banishment_phase(context):
 *The shadows consume another soul...*
         """
     
-    try:
-        await context.bot.send_animation(
-            chat_id=game.group_chat_id,
-            animation=PHASE_GIFS['banishment'],
-            caption=banishment_message,
-            parse_mode='Markdown'
-        )
-    except Exception:
-        await context.bot.send_message(
-            chat_id=game.group_chat_id,
-            text=banishment_message,
-            parse_mode='Markdown'
-        )
-    
-    # Clear votes and increment day
-    game.votes.clear()
-    game.night_actions.clear()
+    announce(context, game, 'banishment', banishment_message)
     
     # Check win conditions
-    if await check_win_condition(context):
+    if await check_win_condition(context, game, events):
         return
     
-    # Advance to next day
-    game.day_number += 1
-    
     # Brief pause before next night
-    await asyncio.sleep(10)
-    await start_night_phase(context)
+    schedule_phase(context, game, BANISHMENT_DURATION, start_night_phase)
 
-async def check_win_condition(context):
-    """Enhanced win condition checking with dramatic endings"""
-    if not game.game_active:
-        return True
-        
+async def check_win_condition(context, game, events):
+    """Announce the ending if the phase's events decided the game"""
+    result = next((event for event in events if isinstance(event, engine.GameOver)), None)
+    if result is None:
+        return False
+    
     alive_players = game.get_alive_players()
     
     # Check minimum players
-    if len(alive_players) <= 1:
-        game.game_active = False
-        
-        survivor_name = list(alive_players.values())[0]['name'] if alive_players else "None"
+    if result.winner is None:
+        survivor_name = list(alive_players.values())[0].name if alive_players else "None"
         
         ending_message = f"""
 🏁 **THE SHADOW COURT FALLS SILENT**
@@ -1099,58 +1256,347 @@ async def check_win_condition(context):
 🎮 **Ready for another ritual?** Type `/join`!
         """
         
-        try:
-            await context.bot.send_animation(
-                chat_id=game.group_chat_id,
-                animation=PHASE_GIFS['banishment'],
-                caption=ending_message,
-                parse_mode='Markdown'
-            )
-        except Exception:
-            await context.bot.send_message(
-                chat_id=game.group_chat_id,
-                text=ending_message,
-                parse_mode='Markdown'
-            )
-        
-        game.reset()
-        return True
-    
-    # Count team members
-    good_count = len(game.get_players_by_team('good'))
-    evil_count = len(game.get_players_by_team('evil'))
-    neutral_count = len(game.get_players_by_team('neutral'))
+        announce(context, game, 'banishment', ending_message)
     
     # Check Good victory
-    if evil_count == 0:
-        game.game_active = False
-        
+    elif result.winner == 'good':
         victory_message = f"""
 👑 **VICTORY FOR THE LIGHT!**
 
 ✨ **The Shadow Court is purified!**
 
 **🏆 TRIUMPHANT HEROES:**
-{chr(10).join([f"🌟 **{p['name']}** ({ROLES[p['role']]['name']})" for p in alive_players.values() if ROLES[p['role']]['team'] == 'good'])}
+{name_lines([f"🌟 **{p.name}** ({ROLES[p.role]['name']})" for p in alive_players.values() if p.team == 'good'])}
 
 **📊 Victory Statistics:**
 • **Days to Victory:** {game.day_number}
-• **Heroes Surviving:** {good_count}
-• **Evil Eliminated:** {len([p for p in game.players.values() if not p['alive'] and ROLES[p['role']]['team'] == 'evil'])}
+• **Heroes Surviving:** {game.count_alive('good')}
+• **Evil Eliminated:** {game.count_dead('evil')}
 
 *Light banishes the darkness forever!*
 
 🎮 **Play again?** Type `/join` for another epic battle!
         """
         
-        try:
-            await context.bot.send_animation(
-                chat_id=game.group_chat_id,
-                animation=PHASE_GIFS['victory_good'],
-                caption=victory_message,
-                parse_mode='Markdown'
-            )
-        except Exception:
-            await context.bot.send_message(
-                chat_id=game.group_chat_id,
-                text=victory_messa
+        announce(context, game, 'victory_good', victory_message)
+    
+    # Check Evil victory
+    else:
+        victory_message = f"""
+💀 **DARKNESS CONQUERS THE COURT!**
+
+🩸 **The shadows have devoured the light!**
+
+**😈 VICTORIOUS VILLAINS:**
+{name_lines([f"🩸 **{p.name}** ({ROLES[p.role]['name']})" for p in alive_players.values() if p.team == 'evil'])}
+
+**📊 Victory Statistics:**
+• **Days to Victory:** {game.day_number}
+• **Villains Surviving:** {game.count_alive('evil')}
+• **Good Eliminated:** {game.count_dead('good')}
+
+*The Shadow Court belongs to the night...*
+
+🎮 **Seek revenge?** Type `/join` for another epic battle!
+        """
+        
+        announce(context, game, 'victory_evil', victory_message)
+    
+    stats_store.record(game, result.winner)
+    end_session(game, result.winner or 'silent')
+    return True
+
+def record_submission(context, game):
+    """Persist a new action or vote and pull the phase deadline forward once everyone is in"""
+    session_store.save(game)
+    if not all_submitted(game):
+        return
+    
+    deadline = phase_scheduler.deadline(game.group_chat_id)
+    if deadline is None:
+        return  # DMs still going out; the phase checks again once they're sent
+    if deadline - asyncio.get_running_loop().time() <= EARLY_RESOLUTION_GRACE:
+        return
+    
+    next_phase = start_dawn_phase if game.phase == "night" else start_banishment_phase
+    schedule_phase(context, game, EARLY_RESOLUTION_GRACE, next_phase)
+
+async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle night action and voting buttons from player DMs"""
+    query = update.callback_query
+    user_id = query.from_user.id
+    callback = callbacks.decode(query.data)
+    
+    if callback is None:
+        await query.answer("⌛ This button has expired.", show_alert=True)
+        return
+    
+    chat_id = player_sessions.get(user_id)
+    game = sessions.get(chat_id) if chat_id is not None else None
+    
+    if game is None or not game.game_active or user_id not in game.players:
+        await query.answer("❌ You're not in an active game!", show_alert=True)
+        return
+    
+    if not game.players[user_id].alive:
+        await query.answer("💀 The dead cannot act!", show_alert=True)
+        return
+    
+    # Buttons name their game, day and phase, so stale or foreign ones stop here
+    if not callbacks.is_current(callback, game):
+        closed = "⏰ The night has already passed!" if callback.phase == "night" else "⏰ Voting is closed!"
+        await query.answer(closed, show_alert=True)
+        return
+    
+    if callback.action == "page":
+        if callback.phase == "night" and not game.players[user_id].action:
+            await query.answer("❌ Invalid action!", show_alert=True)
+            return
+        await query.answer()
+        action_panels.edit(context.bot, user_id, query.message.message_id,
+                           reply_markup=player_keyboard(game, user_id, callback.target))
+        return
+    
+    if callback.phase == "night":
+        if callback.action == "skip":
+            engine.submit_night_action(game, user_id, 'skip', None)
+            event_log.record(game, 'act', user_id, 'skip', None)
+            record_submission(context, game)
+            await query.answer("⏭️ Action skipped")
+            action_panels.edit(context.bot, user_id, query.message.message_id,
+                               text="⏭️ **You chose to rest tonight.**\n\n*Tap another button to change your mind.*",
+                               reply_markup=query.message.reply_markup, parse_mode='Markdown')
+            return
+        
+        action_type = game.players[user_id].action
+        if callback.action != action_type:
+            await query.answer("❌ Invalid action!", show_alert=True)
+            return
+        
+        target_id = callback.target
+        if target_id not in engine.night_targets(game, user_id):
+            await query.answer("❌ That player can't be targeted!", show_alert=True)
+            return
+        
+        engine.submit_night_action(game, user_id, action_type, target_id)
+        event_log.record(game, 'act', user_id, action_type, target_id)
+        record_submission(context, game)
+        await query.answer("✅ Action locked in")
+        action_panels.edit(
+            context.bot, user_id, query.message.message_id,
+            text=f"✅ **Action locked in:** {game.players[target_id].name}\n\n*Wait for dawn, or tap another button to change it.*",
+            reply_markup=query.message.reply_markup,
+            parse_mode='Markdown'
+        )
+    
+    else:
+        if callback.action == "skip":
+            engine.submit_vote(game, user_id, "skip")
+            event_log.record(game, 'vote', user_id, "skip")
+            record_submission(context, game)
+            await query.answer("⏭️ Vote skipped")
+            action_panels.edit(context.bot, user_id, query.message.message_id,
+                               text="⏭️ **You abstained from this trial.**\n\n*Tap another button to change your vote.*",
+                               reply_markup=query.message.reply_markup, parse_mode='Markdown')
+            return
+        
+        if callback.action != "vote":
+            await query.answer("❌ Invalid vote!", show_alert=True)
+            return
+        
+        target_id = callback.target
+        if target_id not in engine.vote_targets(game, user_id):
+            await query.answer("❌ You can't vote for that player!", show_alert=True)
+            return
+        
+        engine.submit_vote(game, user_id, target_id)
+        event_log.record(game, 'vote', user_id, target_id)
+        record_submission(context, game)
+        await query.answer("🗳️ Vote cast")
+        action_panels.edit(
+            context.bot, user_id, query.message.message_id,
+            text=f"🗳️ **Your vote:** Exile {game.players[target_id].name}\n\n*Your judgment is sealed in secret until the trial closes.*",
+            reply_markup=query.message.reply_markup,
+            parse_mode='Markdown'
+        )
+
+async def track_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Record update arrival for the health and lag metrics"""
+    # Button presses carry the timestamp of the bot's own DM, not of the click
+    message = update.effective_message if update.callback_query is None else None
+    health_server.record_update(message.date if message else None)
+
+def checkpoint_sessions():
+    """Save every session together with the Unix time its pending phase transition is due"""
+    loop_now = asyncio.get_running_loop().time()
+    now = time.time()
+    for chat_id, game in sessions.items():
+        deadline = phase_scheduler.deadline(chat_id)
+        session_store.save(game, None if deadline is None else now + deadline - loop_now)
+
+def restore_sessions(application, stored):
+    """Rehydrate persisted sessions and resume each one's phase timer"""
+    context = CallbackContext(application)
+    next_phases = {
+        'convening': (CONVENING_DURATION, start_night_phase),
+        'night': (NIGHT_DURATION, start_dawn_phase),
+        'dawn': (DAWN_DURATION, start_trial_phase),
+        'trial': (TRIAL_DURATION, start_banishment_phase),
+        'banishment': (BANISHMENT_DURATION, start_night_phase)
+    }
+    now = datetime.now()
+    restored = 0
+    
+    for chat_id, (data, resume_at) in stored.items():
+        if BOT_MODE == 'worker' and shard_ring.owner(chat_id) != WORKER_INDEX:
+            continue  # Another worker's session; the database is shared
+        restored += 1
+        game = GameState.from_dict(data)
+        if game.game_id is None:
+            game.game_id = uuid.uuid4().hex  # Saved before games had ids; buttons need one
+        sessions[chat_id] = game
+        for player_id in game.players:
+            player_sessions[player_id] = chat_id
+        
+        if game.game_active and game.phase in next_phases:
+            duration, next_phase = next_phases[game.phase]
+            if resume_at is not None:
+                # Checkpointed by a graceful shutdown: keep the exact deadline, early resolution included
+                delay = resume_at - time.time()
+            else:
+                delay = duration - (now - game.phase_start_time).total_seconds()
+            phase_scheduler.schedule(chat_id, max(0, delay), next_phase, context, game)
+        elif not game.game_active and len(game.players) >= lobby_size(game):
+            phase_scheduler.schedule(chat_id, LOBBY_COUNTDOWN, start_game, context, game)
+        elif not game.game_active:
+            delay = LOBBY_IDLE_TIMEOUT if resume_at is None else resume_at - time.time()
+            phase_scheduler.schedule(chat_id, max(0, delay), expire_lobby, context, game)
+    
+    if restored:
+        logger.info(f"Resumed {restored} session(s) from {SESSION_DB_PATH}")
+
+async def post_init(application):
+    """Start the health server, open the stores, restore saved sessions and warm the GIF file_id cache"""
+    await health_server.start()
+    await event_log.start()
+    await stats_store.open()
+    restore_sessions(application, await session_store.open())
+    await peer_seats.start()
+    animation_cache.load()
+    if GIF_WARMUP_CHAT_ID:
+        await animation_cache.warm(application.bot, int(GIF_WARMUP_CHAT_ID))
+
+async def post_stop(application):
+    """Drain for a restart while the bot can still send, within SHUTDOWN_TIMEOUT.
+
+    By now no new updates are handled and /join refuses players. Phase
+    transitions in flight get to finish, every session is checkpointed with
+    its next deadline, and queued panel edits and messages are delivered;
+    whatever is still unsent when the budget runs out is dropped.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SHUTDOWN_TIMEOUT
+    logger.info(f"Draining {len(sessions)} session(s) before shutdown")
+    await phase_scheduler.drain(SHUTDOWN_TIMEOUT)
+    checkpoint_sessions()
+    await phase_scheduler.stop()
+    flush = asyncio.gather(action_panels.close(), outbox.close())
+    try:
+        await asyncio.wait_for(asyncio.shield(flush), max(0, deadline - loop.time()))
+    except asyncio.TimeoutError:
+        logger.warning(f"Shutdown deadline reached, dropping {outbox.pending()} queued message(s)")
+        flush.cancel()
+        await asyncio.gather(flush, return_exceptions=True)
+
+async def post_shutdown(application):
+    """Write the session checkpoint, game logs and finished-game stats and stop the health server"""
+    await session_store.close()
+    await event_log.close()
+    await stats_store.close()
+    await peer_seats.close()
+    await health_server.stop()
+
+def main():
+    """Start the Shadow Court bot"""
+    if WORKERS > 1 and BOT_MODE != 'worker':
+        # This process only routes updates; each worker is this script again in BOT_MODE=worker
+        if BOT_MODE == 'webhook' and not WEBHOOK_URL:
+            raise SystemExit("BOT_MODE=webhook requires WEBHOOK_URL")
+        logger.info(f"🌌 Shadow Court ingress is starting {WORKERS} workers...")
+        asyncio.run(serve_sharded(
+            BOT_TOKEN,
+            WORKERS,
+            PORT,
+            # The bot-wide DM budget is split between the workers
+            dict(os.environ, DM_GLOBAL_RATE=str(DM_GLOBAL_RATE / WORKERS)),
+            WORKER_SOCKET_DIR,
+            api_url=TELEGRAM_API_URL,
+            webhook_url=WEBHOOK_URL if BOT_MODE == 'webhook' else None,
+            webhook_path=WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            max_connections=min(MAX_CONCURRENT_UPDATES * WORKERS, 100),
+            shutdown_timeout=SHUTDOWN_TIMEOUT
+        ))
+        return
+    
+    builder = Application.builder().token(BOT_TOKEN)
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(f"{TELEGRAM_API_URL.rstrip('/')}/bot")
+    application = (
+        builder
+        .update_queue(asyncio.Queue(maxsize=UPDATE_QUEUE_SIZE))
+        .concurrent_updates(MAX_CONCURRENT_UPDATES)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    
+    application.add_handler(TypeHandler(Update, track_update), group=-1)
+    application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CommandHandler("rules", rules_command))
+    application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("join", join_command))
+    application.add_handler(CommandHandler("players", players_command))
+    application.add_handler(CommandHandler("roles", roles_command))
+    application.add_handler(CommandHandler("status", status_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CommandHandler("leaderboard", leaderboard_command))
+    application.add_handler(CommandHandler("gather", gather_command))
+    application.add_handler(CommandHandler("begin", begin_command))
+    application.add_handler(CommandHandler("endgame", endgame_command))
+    application.add_handler(CallbackQueryHandler(button_callback))
+    
+    if BOT_MODE == 'worker':
+        # Updates come from the sharding ingress over WORKER_SOCKET, never from Telegram directly
+        WebhookReceiver(application).register(health_server.app, UPDATE_PATH)
+        register_seat_lookup(health_server.app, player_sessions.get)
+        logger.info(f"🌌 Shadow Court worker {WORKER_INDEX}/{WORKERS} is starting...")
+        asyncio.run(serve_webhook(
+            application,
+            None,
+            post_init=post_init,
+            post_stop=post_stop,
+            post_shutdown=post_shutdown
+        ))
+    elif BOT_MODE == 'webhook':
+        if not WEBHOOK_URL:
+            raise SystemExit("BOT_MODE=webhook requires WEBHOOK_URL")
+        # Routes must exist before post_init starts the shared aiohttp server
+        WebhookReceiver(application, WEBHOOK_SECRET).register(health_server.app, WEBHOOK_PATH)
+        logger.info("🌌 Shadow Court bot is starting in webhook mode...")
+        asyncio.run(serve_webhook(
+            application,
+            WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            max_connections=min(MAX_CONCURRENT_UPDATES, 100),
+            post_init=post_init,
+            post_stop=post_stop,
+            post_shutdown=post_shutdown
+        ))
+    else:
+        logger.info("🌌 Shadow Court bot is starting...")
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
+
+if __name__ == '__main__':
+    main()
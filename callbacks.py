@@ -0,0 +1,49 @@
+import base64
+import struct
+import binascii
+from collections import namedtuple
+
+# Bump when the layout changes; buttons from older layouts are rejected as expired
+VERSION = 2
+
+# version, group chat, game tag, day, phase, action, target - 25 bytes, 34 characters once encoded.
+# The chat id comes first so the sharding ingress can route a button press without decoding the rest.
+_LAYOUT = struct.Struct('>BqIHBBq')
+
+PHASES = ('night', 'trial')
+# Append only: a code's meaning must not change while buttons using it are live
+ACTIONS = ('vote', 'skip', 'kill', 'protect', 'investigate', 'commune', 'dayshoot', 'cancel_votes', 'swap', 'page')
+_PHASE_CODES = {phase: code for code, phase in enumerate(PHASES)}
+_ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+NO_TARGET = 0  # Player ids are never 0; marks skips
+
+Callback = namedtuple('Callback', 'chat_id tag day phase action target')
+
+def game_tag(game):
+    """32-bit tag naming one game; taken from the random game_id, never from the seed"""
+    return int(game.game_id[:8], 16)
+
+def encode(game, action, target=NO_TARGET):
+    """callback_data for a button in the game's current day and phase"""
+    packed = _LAYOUT.pack(VERSION, game.group_chat_id, game_tag(game), game.day_number,
+                          _PHASE_CODES[game.phase], _ACTION_CODES[action], target)
+    return base64.urlsafe_b64encode(packed).rstrip(b'=').decode('ascii')
+
+def decode(data):
+    """Parse callback_data into a Callback, or None if it isn't ours or uses an old layout"""
+    if not data or len(data) > 64:
+        return None
+    try:
+        packed = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+        version, chat_id, tag, day, phase, action, target = _LAYOUT.unpack(packed)
+    except (binascii.Error, struct.error, ValueError):
+        return None
+    if version != VERSION or phase >= len(PHASES) or action >= len(ACTIONS):
+        return None
+    return Callback(chat_id, tag, day, PHASES[phase], ACTIONS[action], target)
+
+def is_current(callback, game):
+    """Whether a decoded button belongs to this game's current day and phase"""
+    return (callback.tag == game_tag(game) and callback.day == game.day_number
+            and callback.phase == game.phase)
@@ -0,0 +1,460 @@
+import random
+from enum import StrEnum
+from collections import namedtuple
+from datetime import datetime
+
+class Team(StrEnum):
+    GOOD = 'good'
+    EVIL = 'evil'
+    NEUTRAL = 'neutral'
+
+class Role(StrEnum):
+    BLOODSEEKER = 'bloodseeker'
+    ORACLE = 'oracle'
+    GUARDIAN = 'guardian'
+    CITIZEN = 'citizen'
+    TRICKSTER = 'trickster'
+    SOULHUNTER = 'soulhunter'
+    JUSTICAR = 'justicar'
+    SPIRITWALKER = 'spiritwalker'
+
+# Enhanced role definitions with full features
+ROLES = {
+    'bloodseeker': {
+        'name': '🩸 Bloodseeker',
+        'description': 'Kill one player each night. Work with other evil players.',
+        'team': 'evil',
+        'action': 'kill',
+        'win_condition': 'Eliminate all good players or equal their numbers'
+    },
+    'oracle': {
+        'name': '🔮 Oracle', 
+        'description': 'Investigate one player each night to learn their alignment.',
+        'team': 'good',
+        'action': 'investigate',
+        'win_condition': 'Eliminate all evil players'
+    },
+    'guardian': {
+        'name': '🛡️ Guardian',
+        'description': 'Protect one player each night from death (including yourself).',
+        'team': 'good', 
+        'action': 'protect',
+        'win_condition': 'Eliminate all evil players'
+    },
+    'citizen': {
+        'name': '🌿 Citizen',
+        'description': 'Vote during trials to find and eliminate evil players.',
+        'team': 'good',
+        'action': None,
+        'win_condition': 'Eliminate all evil players'
+    },
+    'trickster': {
+        'name': '🃏 Trickster',
+        'description': 'Survive until the end. Can swap two players\' votes once per game.',
+        'team': 'neutral',
+        'action': 'swap',
+        'win_condition': 'Survive to the final 3 players'
+    },
+    'soulhunter': {
+        'name': '🏹 Soulhunter', 
+        'description': 'Evil assassin with one daytime kill ability.',
+        'team': 'evil',
+        'action': 'dayshoot',
+        'win_condition': 'Eliminate all good players or equal their numbers'
+    },
+    'justicar': {
+        'name': '⚖️ Justicar',
+        'description': 'Can cancel all votes once per game during trial phase.',
+        'team': 'good',
+        'action': 'cancel_votes',
+        'win_condition': 'Eliminate all evil players'
+    },
+    'spiritwalker': {
+        'name': '👻 Spiritwalker',
+        'description': 'Can communicate with dead players and learn one role.',
+        'team': 'good',
+        'action': 'commune',
+        'win_condition': 'Eliminate all evil players'
+    }
+}
+
+MIN_PLAYERS = 4
+MAX_PLAYERS = 50  # Large community events; DM keyboards page through targets past a handful
+
+def get_large_role_distribution(player_count):
+    """Line-up for 11+ players: a bloodseeker and a guardian per ten seats, a soulhunter
+    bridging each step in between, citizens fill the rest"""
+    roles = (
+        ['bloodseeker'] * (1 + player_count // 10)
+        + ['soulhunter'] * ((player_count + 7) // 10 - player_count // 10)
+        + ['oracle'] * (1 + player_count // 40)
+        + ['guardian'] * (player_count // 10)
+        + ['spiritwalker'] * (1 + player_count // 30)
+        + ['justicar'] * (1 + player_count // 25)
+        + ['trickster'] * (player_count // 15)
+    )
+    return roles + ['citizen'] * (player_count - len(roles))
+
+def get_role_distribution(player_count):
+    """Advanced role distribution based on player count"""
+    if player_count > 10:
+        return get_large_role_distribution(player_count)
+    if player_count == 4:
+        return ['bloodseeker', 'oracle', 'guardian', 'citizen']
+    elif player_count == 5:
+        return ['bloodseeker', 'oracle', 'guardian', 'citizen', 'trickster']
+    elif player_count == 6:
+        return ['bloodseeker', 'oracle', 'guardian', 'citizen', 'citizen', 'trickster']
+    elif player_count == 7:
+        return ['bloodseeker', 'bloodseeker', 'oracle', 'guardian', 'citizen', 'citizen', 'trickster']
+    elif player_count == 8:
+        return ['bloodseeker', 'bloodseeker', 'oracle', 'guardian', 'soulhunter', 'citizen', 'citizen', 'trickster']
+    elif player_count == 9:
+        return ['bloodseeker', 'bloodseeker', 'oracle', 'guardian', 'soulhunter', 'citizen', 'citizen', 'citizen', 'justicar']
+    else:  # 10
+        return ['bloodseeker', 'bloodseeker', 'bloodseeker', 'oracle', 'guardian', 'soulhunter', 'spiritwalker', 'citizen', 'citizen', 'justicar']
+
+# Resolved once so hot paths never go through the ROLES dicts
+ROLE_TEAM = {Role(key): Team(info['team']) for key, info in ROLES.items()}
+ROLE_ACTION = {Role(key): info['action'] for key, info in ROLES.items()}
+
+class Player:
+    """One seat in a game; slotted to keep thousands of concurrent lobbies small"""
+    __slots__ = ('name', 'username', 'join_time', 'role', 'team', 'action', 'alive', 'protected')
+    
+    def __init__(self, name, username, join_time, role=None, alive=True, protected=False):
+        self.name = name
+        self.username = username
+        self.join_time = join_time
+        self.alive = alive
+        self.protected = protected
+        self.assign(role)
+    
+    def assign(self, role):
+        """Give the player a role, caching its team and night action"""
+        self.role = Role(role) if role is not None else None
+        self.team = ROLE_TEAM.get(self.role)
+        self.action = ROLE_ACTION.get(self.role)
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'username': self.username,
+            'role': self.role and self.role.value,
+            'alive': self.alive,
+            'protected': self.protected,
+            'join_time': self.join_time.isoformat()
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['name'], data['username'], datetime.fromisoformat(data['join_time']),
+                   data['role'], data['alive'], data['protected'])
+
+# Game state management
+class GameState:
+    def __init__(self, group_chat_id=None):
+        self.players = {}  # {user_id: Player}
+        self.game_active = False
+        self.phase = "waiting"  # waiting, night, dawn, trial, banishment
+        self.votes = {}  # {voter_id: voted_for_id}
+        self.night_actions = {}  # {action_type: {user_id: target_id}}
+        self.expected_actors = set()  # Players the current night/trial is waiting on
+        self.group_chat_id = group_chat_id
+        self.day_number = 0
+        self.phase_start_time = None
+        self.special_abilities_used = {}  # Track one-time abilities
+        self.game_id = None  # Names the game's event log
+        self.seed = None  # Every random decision in the game derives from this
+        self.lobby_target = None  # Players a host asked the lobby to wait for; cleared when the game starts
+        # Derived indexes, kept in step with players by seat/reindex/kill
+        self.alive_ids = {}  # Living player ids in seating order (dict as an ordered set)
+        self.alive_by_team = {}  # {team: {player_id: None}} for living players with a role
+        self.team_sizes = {}  # {team: players dealt onto it}
+        
+    def reset(self):
+        self.__init__(self.group_chat_id)
+    
+    def seat(self, player_id):
+        """Index a newly added player as alive"""
+        self.alive_ids[player_id] = None
+    
+    def reindex(self):
+        """Rebuild the alive and team indexes from the player records"""
+        self.alive_ids = {pid: None for pid, player in self.players.items() if player.alive}
+        self.alive_by_team = {}
+        self.team_sizes = {}
+        for pid, player in self.players.items():
+            if player.team is None:
+                continue
+            self.team_sizes[player.team] = self.team_sizes.get(player.team, 0) + 1
+            if player.alive:
+                self.alive_by_team.setdefault(player.team, {})[pid] = None
+    
+    def kill(self, player_id):
+        """Mark a player dead and drop them from the living indexes"""
+        player = self.players[player_id]
+        player.alive = False
+        self.alive_ids.pop(player_id, None)
+        self.alive_by_team.get(player.team, {}).pop(player_id, None)
+    
+    def count_alive(self, team=None):
+        """Living players, optionally on one team, in O(1)"""
+        if team is None:
+            return len(self.alive_ids)
+        return len(self.alive_by_team.get(team, ()))
+    
+    def count_dead(self, team):
+        return self.team_sizes.get(team, 0) - self.count_alive(team)
+    
+    def get_alive_players(self):
+        return {pid: self.players[pid] for pid in self.alive_ids}
+    
+    def get_players_by_team(self, team):
+        return {pid: self.players[pid] for pid in self.alive_by_team.get(team, ())}
+    
+    def to_dict(self):
+        """JSON-safe snapshot; int-keyed maps become [key, value] pairs"""
+        data = {
+            'game_id': self.game_id,
+            'seed': self.seed,
+            'group_chat_id': self.group_chat_id,
+            'game_active': self.game_active,
+            'phase': self.phase,
+            'day_number': self.day_number,
+            'phase_start_time': self.phase_start_time.isoformat() if self.phase_start_time else None,
+            'players': [[pid, player.to_dict()] for pid, player in self.players.items()],
+            'votes': list(self.votes.items()),
+            'night_actions': {action: list(actors.items()) for action, actors in self.night_actions.items()},
+            'expected_actors': sorted(self.expected_actors),
+            'special_abilities_used': list(self.special_abilities_used.items())
+        }
+        if self.lobby_target is not None:
+            # Only lobbies carry it, so digests of games in progress match logs written before it existed
+            data['lobby_target'] = self.lobby_target
+        return data
+    
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data['group_chat_id'])
+        state.game_id = data.get('game_id')
+        state.seed = data.get('seed')
+        state.game_active = data['game_active']
+        state.phase = data['phase']
+        state.day_number = data['day_number']
+        if data['phase_start_time']:
+            state.phase_start_time = datetime.fromisoformat(data['phase_start_time'])
+        state.players = {pid: Player.from_dict(pdata) for pid, pdata in data['players']}
+        state.votes = dict(data['votes'])
+        state.night_actions = {action: dict(actors) for action, actors in data['night_actions'].items()}
+        state.expected_actors = set(data['expected_actors'])
+        state.special_abilities_used = dict(data['special_abilities_used'])
+        state.lobby_target = data.get('lobby_target')
+        state.reindex()
+        return state
+
+# Events emitted by the engine for the Telegram layer (or a simulator) to render
+RoleAssigned = namedtuple('RoleAssigned', 'player_id role')
+PlayerKilled = namedtuple('PlayerKilled', 'player_id role')
+PlayerSaved = namedtuple('PlayerSaved', 'player_id')
+Investigated = namedtuple('Investigated', 'investigator_id target_id role team')
+Communed = namedtuple('Communed', 'medium_id target_id role')
+TrialResolved = namedtuple('TrialResolved', 'exiled_id vote_counts skipped total_votes')
+GameOver = namedtuple('GameOver', 'winner')  # 'good', 'evil' or None when too few remain
+
+def derive_rng(seed, *step):
+    """Independent RNG for one random decision, so replays and resumed games draw identically"""
+    return random.Random(":".join(str(part) for part in (seed, *step)))
+
+def add_player(state, player_id, name, username=None, join_time=None):
+    """Seat a player in the lobby"""
+    state.players[player_id] = Player(name, username or name, join_time or datetime.now())
+    state.seat(player_id)
+
+def start_game(state, rng=random, roles=None):
+    """Deal roles to everyone seated and open day 1, optionally from a custom line-up"""
+    player_ids = list(state.players.keys())
+    roles = list(roles) if roles is not None else get_role_distribution(len(player_ids))
+    rng.shuffle(roles)
+    
+    state.game_active = True
+    state.day_number = 1
+    
+    events = []
+    for i, player_id in enumerate(player_ids):
+        player = state.players[player_id]
+        player.assign(roles[i])
+        player.protected = False
+        events.append(RoleAssigned(player_id, player.role))
+    state.reindex()
+    return state, events
+
+def begin_night(state):
+    """Clear last night's actions and protections"""
+    state.night_actions = {}
+    for player in state.players.values():
+        player.protected = False
+
+def _protect(state, actor_ids, target_id, target):
+    target.protected = True
+    return []
+
+def _kill(state, actor_ids, target_id, target):
+    state.kill(target_id)
+    return [PlayerKilled(target_id, target.role)]
+
+def _investigate(state, actor_ids, target_id, target):
+    return [Investigated(actor_id, target_id, target.role, target.team or 'unknown') for actor_id in actor_ids]
+
+def _commune(state, actor_ids, target_id, target):
+    return [Communed(actor_id, target_id, target.role) for actor_id in actor_ids]
+
+def _saved(state, actor_ids, target_id, target):
+    return [PlayerSaved(target_id)]
+
+# How each night action resolves against the actions sharing its target.
+#   order      - lower resolves first on a target
+#   needs_alive- True: living targets only, False: the dead only, None: anyone
+#   allow_self - whether the actor may pick themselves
+#   cancels    - actions this one stops on the same target
+#   effect / on_cancel - (state, actor_ids, target_id, target) -> events
+# Actions without a rule (the day abilities) have no effect at night.
+NightRule = namedtuple('NightRule', 'order needs_alive allow_self cancels effect on_cancel')
+NIGHT_RULES = {
+    'protect': NightRule(0, True, True, ('kill',), _protect, None),
+    'kill': NightRule(1, True, False, (), _kill, _saved),
+    'investigate': NightRule(2, None, True, (), _investigate, None),
+    'commune': NightRule(2, False, False, (), _commune, None)
+}
+
+def night_targets(state, player_id):
+    """Players the given player may target with their night action"""
+    action_type = state.players[player_id].action
+    if not action_type:
+        return []
+    rule = NIGHT_RULES.get(action_type)
+    if rule is not None and rule.needs_alive is False:
+        candidates = [pid for pid, player in state.players.items() if not player.alive]
+    else:
+        candidates = state.alive_ids
+    allow_self = rule is None or rule.allow_self
+    return [target_id for target_id in candidates if allow_self or target_id != player_id]
+
+def acts_at_night(state, player_id):
+    """Whether a player's night action has a rule to resolve it and someone to aim at tonight"""
+    return state.players[player_id].action in NIGHT_RULES and bool(night_targets(state, player_id))
+
+def resolve_night(state, night_actions):
+    """Apply a night's actions ({action_type: {actor_id: target_id}}) and report what happened.
+
+    Actions are bucketed by target in one pass, then each target resolves its
+    actions in rule order, honouring the cancels declared in NIGHT_RULES.
+    """
+    by_target = {}  # {target_id: {action_type: [actor_id, ...]}}
+    for action_type, actors in night_actions.items():
+        if action_type not in NIGHT_RULES:
+            continue
+        for actor_id, target_id in actors.items():
+            by_target.setdefault(target_id, {}).setdefault(action_type, []).append(actor_id)
+    
+    events = []
+    for target_id, actions in by_target.items():
+        target = state.players.get(target_id)
+        if target is None:
+            continue
+        cancelled = {cancel for action_type in actions for cancel in NIGHT_RULES[action_type].cancels}
+        for action_type, actor_ids in sorted(actions.items(), key=lambda item: NIGHT_RULES[item[0]].order):
+            rule = NIGHT_RULES[action_type]
+            if rule.needs_alive is not None and target.alive != rule.needs_alive:
+                continue
+            if action_type in cancelled:
+                if rule.on_cancel is not None:
+                    events.extend(rule.on_cancel(state, actor_ids, target_id, target))
+                continue
+            events.extend(rule.effect(state, actor_ids, target_id, target))
+    return state, events
+
+def vote_targets(state, voter_id):
+    """Living players the given voter may vote to exile"""
+    return [target_id for target_id in state.alive_ids if target_id != voter_id]
+
+def begin_trial(state):
+    """Open a fresh ballot"""
+    state.votes = {}
+
+def submit_night_action(state, actor_id, action_type, target_id):
+    """Record (or change) a night choice; action_type 'skip' means resting tonight"""
+    for action, actors in state.night_actions.items():
+        if action != action_type:
+            actors.pop(actor_id, None)
+    state.night_actions.setdefault(action_type, {})[actor_id] = target_id
+
+def submit_vote(state, voter_id, target_id):
+    """Record (or change) a trial vote; target "skip" abstains"""
+    state.votes[voter_id] = target_id
+
+def resolve_trial(state, votes, rng=random):
+    """Tally votes ({voter_id: target_id or "skip"}) and exile the leader, breaking ties randomly"""
+    vote_counts = dict.fromkeys(state.alive_ids, 0)
+    skipped = 0
+    for voted_for in votes.values():
+        if voted_for == "skip":
+            skipped += 1
+        elif voted_for in vote_counts:
+            vote_counts[voted_for] += 1
+    
+    exiled_id = None
+    if vote_counts and max(vote_counts.values()) > 0:
+        max_votes = max(vote_counts.values())
+        candidates = [pid for pid, count in vote_counts.items() if count == max_votes]
+        exiled_id = rng.choice(candidates)
+        state.kill(exiled_id)
+    
+    return state, [TrialResolved(exiled_id, vote_counts, skipped, len(votes))]
+
+def end_day(state):
+    """Discard the day's votes and actions before the next night"""
+    state.votes.clear()
+    state.night_actions.clear()
+
+def check_winner(state):
+    """Close the game if it is decided, returning a GameOver event or None"""
+    if state.count_alive() <= 1:
+        winner = None
+    elif not state.count_alive('evil'):
+        winner = 'good'
+    elif state.count_alive('evil') >= state.count_alive('good'):
+        winner = 'evil'
+    else:
+        return None
+    
+    state.game_active = False
+    return GameOver(winner)
+
+def apply_phase(state, phase):
+    """Run the rules that fire when a game enters a phase and return the resulting events.
+
+    This is the single sequence both the bot and the replay tool follow, so a
+    logged game reproduces exactly from its seed and recorded submissions.
+    """
+    events = []
+    if phase == "convening":
+        _, events = start_game(state, derive_rng(state.seed, 'deal'))
+    elif phase == "night":
+        begin_night(state)
+    elif phase == "dawn":
+        _, events = resolve_night(state, state.night_actions)
+        result = check_winner(state)
+        if result is not None:
+            events.append(result)
+    elif phase == "trial":
+        begin_trial(state)
+    elif phase == "banishment":
+        _, events = resolve_trial(state, state.votes, derive_rng(state.seed, 'trial', state.day_number))
+        end_day(state)
+        result = check_winner(state)
+        if result is not None:
+            events.append(result)
+        else:
+            state.day_number += 1
+    return state, events
@@ -0,0 +1,89 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+LOG_VERSION = 1
+
+def state_digest(state):
+    """Short fingerprint of a game's full serialized state, checked by replay.py"""
+    snapshot = json.dumps(state.to_dict(), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(snapshot.encode()).hexdigest()[:16]
+
+class EventLog:
+    """Append-only JSON-lines log per game, one compact array per record.
+
+    Every record is [ms_since_start, kind, *fields]. Together with the game's
+    seed this is enough for replay.py to rebuild the state exactly. Records
+    are buffered in memory and appended in batches from a writer thread.
+    """
+
+    def __init__(self, directory, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._pending = {}  # {game_id: [line, ...]}
+        self._started = {}  # {game_id: perf_counter at the header}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='event-log')
+        self._flush_task = None
+
+    def path(self, game_id):
+        return os.path.join(self.directory, f"{game_id}.jsonl")
+
+    def begin(self, game):
+        """Write the header of a new game's log; game_id and seed must already be set"""
+        self._started[game.game_id] = time.perf_counter()
+        self.record(game, 'game', LOG_VERSION, game.game_id, game.group_chat_id, game.seed)
+
+    def record(self, game, kind, *fields):
+        if game.game_id is None:
+            return
+        started = self._started.setdefault(game.game_id, time.perf_counter())
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        line = json.dumps([elapsed_ms, kind, *fields], separators=(',', ':'), ensure_ascii=False)
+        self._pending.setdefault(game.game_id, []).append(line)
+
+    def finish(self, game, reason):
+        """Close a game's log with an end record"""
+        self.record(game, 'end', reason)
+        self._started.pop(game.game_id, None)
+
+    def _append(self, batches):
+        for game_id, lines in batches.items():
+            with open(self.path(game_id), 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+
+    async def start(self):
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(os.makedirs, self.directory, exist_ok=True)
+        )
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batches, self._pending = self._pending, {}
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._append, batches)
+        except OSError as e:
+            logger.error(f"Failed to append event logs for {len(batches)} game(s): {e}")
+            for game_id, lines in batches.items():
+                self._pending[game_id] = lines + self._pending.get(game_id, [])
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self):
+        """Append everything still buffered"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        self._executor.shutdown(wait=True)
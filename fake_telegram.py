@@ -0,0 +1,183 @@
+import json
+import time
+import random
+import asyncio
+import logging
+import itertools
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {
+    'id': 1000000001,
+    'is_bot': True,
+    'first_name': 'Shadow Court',
+    'username': 'shadow_court_test_bot',
+    'can_join_groups': True,
+    'can_read_all_group_messages': False,
+    'supports_inline_queries': False
+}
+
+# Methods that stand in for real outbound traffic and are subject to fault injection
+FAULTY_METHODS = {
+    'sendMessage', 'sendAnimation', 'answerCallbackQuery',
+    'editMessageText', 'editMessageReplyMarkup', 'deleteMessage'
+}
+
+class FakeTelegramServer:
+    """Local stand-in for the Bot API methods Shadow Court uses.
+
+    Point the bot at it with TELEGRAM_API_URL. Tests inject incoming updates
+    with push_message / push_callback and observe outbound calls through the
+    `on_call` hook. Latency, error and 429 rates apply to the send methods.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, flood_rate=0.0, retry_after=1, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.updates = []  # Pending updates not yet confirmed via getUpdates offset
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.callback_ids = itertools.count(1)
+        self.new_update = asyncio.Event()
+        self.call_counts = {}  # {method: count}
+        self.on_call = None  # Optional callable(method, params, result)
+        self.app = web.Application()
+        self.app.router.add_post('/bot{token}/{method}', self.handle)
+        self.app.router.add_get('/bot{token}/{method}', self.handle)
+        self._runner = None
+
+    async def start(self, host='127.0.0.1', port=8081):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    # Incoming updates
+
+    def _push(self, **payload):
+        update_id = next(self.update_ids)
+        self.updates.append({'update_id': update_id, **payload})
+        self.new_update.set()
+        return update_id
+
+    def push_message(self, chat_id, user_id, first_name, text, chat_type='group'):
+        """Queue a text message (commands get a bot_command entity) as an update"""
+        message = {
+            'message_id': next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': chat_type, 'title': f"Court {chat_id}"} if chat_type != 'private'
+                    else {'id': chat_id, 'type': 'private', 'first_name': first_name},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': first_name},
+            'text': text
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        self._push(message=message)
+        return message['message_id']
+
+    def push_callback(self, user_id, first_name, data, message_id):
+        """Queue a button press on one of the bot's DMs; returns the callback query id"""
+        query_id = str(next(self.callback_ids))
+        self._push(callback_query={
+            'id': query_id,
+            'from': {'id': user_id, 'is_bot': False, 'first_name': first_name},
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private', 'first_name': first_name},
+                'from': BOT_USER,
+                'text': '...'
+            }
+        })
+        return query_id
+
+    # Bot API
+
+    async def _params(self, request):
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        for key in ('reply_markup', 'reply_parameters', 'allowed_updates'):
+            if isinstance(params.get(key), str):
+                params[key] = json.loads(params[key])
+        return params
+
+    def _message(self, params, **extra):
+        chat_id = int(params['chat_id'])
+        chat = {'id': chat_id, 'type': 'private', 'first_name': 'Player'} if chat_id > 0 \
+            else {'id': chat_id, 'type': 'group', 'title': f"Court {chat_id}"}
+        return {'message_id': next(self.message_ids), 'date': int(time.time()), 'chat': chat, 'from': BOT_USER, **extra}
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        params = await self._params(request)
+        self.call_counts[method] = self.call_counts.get(method, 0) + 1
+
+        if method in FAULTY_METHODS:
+            if self.latency:
+                await asyncio.sleep(self.rng.expovariate(1 / self.latency))
+            roll = self.rng.random()
+            if roll < self.flood_rate:
+                return web.json_response({
+                    'ok': False, 'error_code': 429,
+                    'description': f"Too Many Requests: retry after {self.retry_after}",
+                    'parameters': {'retry_after': self.retry_after}
+                }, status=429)
+            if roll < self.flood_rate + self.error_rate:
+                return web.json_response({'ok': False, 'error_code': 400, 'description': 'Bad Request: injected failure'}, status=400)
+
+        handler = getattr(self, f"api_{method}", None)
+        if handler is None:
+            result = True
+        else:
+            result = await handler(params)
+        if self.on_call is not None:
+            self.on_call(method, params, result)
+        return web.json_response({'ok': True, 'result': result})
+
+    async def api_getMe(self, params):
+        return BOT_USER
+
+    async def api_getUpdates(self, params):
+        offset = int(params.get('offset') or 0)
+        timeout = float(params.get('timeout') or 0)
+        # Confirmed updates are dropped, as Telegram does
+        self.updates = [update for update in self.updates if update['update_id'] >= offset]
+        if not self.updates and timeout:
+            self.new_update.clear()
+            try:
+                await asyncio.wait_for(self.new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get('limit') or 100)
+        return self.updates[:limit]
+
+    async def api_sendMessage(self, params):
+        return self._message(params, text=params.get('text', ''))
+
+    async def api_sendAnimation(self, params):
+        return self._message(params, caption=params.get('caption', ''), animation={
+            'file_id': f"anim-{abs(hash(params.get('animation')))}",
+            'file_unique_id': 'anim', 'width': 320, 'height': 240, 'duration': 3
+        })
+
+    async def api_editMessageText(self, params):
+        if 'chat_id' not in params:
+            return True
+        message = self._message(params, text=params.get('text', ''))
+        message['message_id'] = int(params['message_id'])
+        return message
+
+    async def api_getChat(self, params):
+        chat_id = int(params['chat_id'])
+        return {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group'}
@@ -0,0 +1,147 @@
+import heapq
+import asyncio
+import logging
+import itertools
+from datetime import timedelta
+from telegram.error import RetryAfter, TimedOut
+from monitoring import metrics
+
+logger = logging.getLogger(__name__)
+
+# Send priorities, lowest first when several sends wait for the same rate limit
+PRIORITY_ACTION = 0  # Night/trial action panels; players are waiting on them
+PRIORITY_RESULT = 1  # Roles, Oracle visions and other private results
+PRIORITY_ANNOUNCE = 2  # Group flavor posts
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursting up to `capacity`.
+
+    When tokens run out, waiters are served by priority (lowest first) and
+    then in arrival order.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = None
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._waker = None
+
+    def _refill(self, now):
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def is_idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity and not self._waiters
+
+    async def acquire(self, priority=0):
+        """Wait until a token is available and take it"""
+        loop = asyncio.get_running_loop()
+        self._refill(loop.time())
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+            return
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._waker is None or self._waker.done():
+            self._waker = asyncio.create_task(self._wake_waiters())
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.tokens += 1  # Granted just as we were cancelled; hand it back
+            raise
+
+    async def _wake_waiters(self):
+        loop = asyncio.get_running_loop()
+        while self._waiters:
+            self._refill(loop.time())
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.tokens -= 1
+                future.set_result(None)
+
+    def pause(self, seconds):
+        """Drain the bucket so nothing is sent for `seconds` (used after a 429)"""
+        loop = asyncio.get_running_loop()
+        self._refill(loop.time())
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+class DMFanout:
+    """Concurrent message sender that respects Telegram's flood limits.
+
+    One global bucket caps the bot's total send rate across every game and a
+    small per-chat bucket keeps each recipient under Telegram's per-chat limit:
+    about one message a second in private chats, 20 a minute in groups
+    (negative chat ids). The group defaults allow at most 2 + 18 = 20 sends in
+    any minute. RetryAfter responses pause the offending bucket and the send
+    is retried.
+    """
+
+    def __init__(self, global_rate=25, per_chat_rate=1, per_chat_burst=3, group_rate=18 / 60, group_burst=2,
+                 max_retries=3):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+        self.chat_buckets = {}  # {chat_id: TokenBucket}
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= 10000:
+                self._prune()
+            if chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune(self):
+        now = asyncio.get_running_loop().time()
+        for chat_id in [cid for cid, bucket in self.chat_buckets.items() if bucket.is_idle(now)]:
+            del self.chat_buckets[chat_id]
+
+    async def send(self, method, chat_id, priority=PRIORITY_RESULT, **kwargs):
+        """Call a bot send method for one chat, waiting for rate limits and retrying 429s"""
+        started = asyncio.get_running_loop().time()
+        try:
+            return await self._send(method, chat_id, priority, **kwargs)
+        except Exception as e:
+            metrics.dm_failures.inc(reason=type(e).__name__)
+            raise
+        finally:
+            metrics.dm_send_latency.observe(asyncio.get_running_loop().time() - started)
+
+    async def _send(self, method, chat_id, priority, **kwargs):
+        chat_bucket = self._chat_bucket(chat_id)
+        attempt = 0
+        while True:
+            await chat_bucket.acquire(priority)
+            await self.global_bucket.acquire(priority)
+            try:
+                return await method(chat_id=chat_id, **kwargs)
+            except RetryAfter as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                logger.warning(f"Flood control for chat {chat_id}, retrying in {retry_after}s")
+                chat_bucket.pause(retry_after)
+            except TimedOut:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                await asyncio.sleep(attempt)
@@ -0,0 +1,87 @@
+import os
+import json
+import logging
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+def is_stale_file_id(error):
+    """Whether a failed send means Telegram no longer accepts the cached file_id itself"""
+    if not isinstance(error, BadRequest):
+        return False  # Rate limits, timeouts and network faults say nothing about the file
+    message = str(error).lower()
+    return 'file identifier' in message or 'file_id' in message
+
+class AnimationCache:
+    """Telegram file_id cache for the phase GIFs.
+
+    The first successful upload of each GIF URL is remembered by file_id and
+    persisted to disk, so later announcements reuse Telegram's copy instead of
+    making it fetch the remote file again.
+    """
+
+    def __init__(self, urls, path):
+        self.urls = urls  # {gif_key: url}
+        self.path = path
+        self.file_ids = {}  # {gif_key: {'url': str, 'file_id': str}}
+
+    def load(self):
+        """Read cached file_ids from disk, ignoring entries for URLs that changed"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable GIF cache {self.path}: {e}")
+            return
+
+        self.file_ids = {
+            key: entry for key, entry in stored.items()
+            if isinstance(entry, dict) and self.urls.get(key) == entry.get('url') and entry.get('file_id')
+        }
+        logger.info(f"Loaded {len(self.file_ids)}/{len(self.urls)} cached GIF file_ids")
+
+    def save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"  # Sharded workers share the cache file
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.file_ids, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not persist GIF cache to {self.path}: {e}")
+
+    def get(self, key):
+        """Best animation reference for a GIF: cached file_id, else the source URL"""
+        entry = self.file_ids.get(key)
+        return entry['file_id'] if entry else self.urls[key]
+
+    def is_cached(self, key):
+        return key in self.file_ids
+
+    def remember(self, key, message):
+        """Capture the file_id Telegram assigned when the GIF was first sent"""
+        if key in self.file_ids or message is None:
+            return
+        media = getattr(message, 'animation', None) or getattr(message, 'document', None)
+        if media is None:
+            return
+        self.file_ids[key] = {'url': self.urls[key], 'file_id': media.file_id}
+        self.save()
+
+    def forget(self, key):
+        """Drop a file_id Telegram no longer accepts"""
+        if self.file_ids.pop(key, None) is not None:
+            self.save()
+
+    async def warm(self, bot, chat_id):
+        """Upload every uncached GIF once to a scratch chat to capture its file_id"""
+        for key, url in self.urls.items():
+            if key in self.file_ids:
+                continue
+            try:
+                message = await bot.send_animation(chat_id=chat_id, animation=url, disable_notification=True)
+                self.remember(key, message)
+                await bot.delete_message(chat_id=chat_id, message_id=message.message_id)
+            except Exception as e:
+                logger.warning(f"Failed to warm GIF '{key}': {e}")
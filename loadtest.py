@@ -0,0 +1,194 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import aiohttp
+
+from fake_telegram import FakeTelegramServer
+
+# Group posts that mean a game is over and the court can be refilled
+ENDING_MARKERS = ('VICTORY FOR THE LIGHT', 'DARKNESS CONQUERS', 'FALLS SILENT')
+# Panel edits confirming a choice keep their buttons; players don't press again
+CONFIRMATION_MARKERS = ('Action locked in', 'Your vote', 'rest tonight', 'abstained')
+
+def percentile(samples, pct):
+    if not samples:
+        return float('nan')
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def rss_mb(pid):
+    """Resident memory of a process in MB (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float('nan')
+
+class LoadTest:
+    """Drives simulated groups of players against a bot talking to FakeTelegramServer"""
+
+    def __init__(self, server, players_per_group, think_time, seed=0):
+        self.server = server
+        self.players_per_group = players_per_group
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.groups = {}  # {group_chat_id: [user_id, ...]}
+        self.names = {}  # {user_id: first_name}
+        self.pending_commands = {}  # {message_id: sent_at}
+        self.pending_callbacks = {}  # {callback_query_id: sent_at}
+        self.command_latency = []
+        self.action_latency = []
+        self.actions = 0
+        self.games_finished = 0
+        server.on_call = self.on_call
+
+    def add_groups(self, count):
+        for _ in range(count):
+            chat_id = -(1000000 + len(self.groups))
+            base = 1000 * (len(self.groups) + 1)
+            user_ids = [base + i for i in range(self.players_per_group)]
+            self.groups[chat_id] = user_ids
+            for user_id in user_ids:
+                self.names[user_id] = f"Player{user_id}"
+            self.join_all(chat_id)
+
+    def join_all(self, chat_id):
+        for user_id in self.groups[chat_id]:
+            message_id = self.server.push_message(chat_id, user_id, self.names[user_id], '/join')
+            self.pending_commands[message_id] = time.perf_counter()
+
+    def reset_samples(self):
+        self.command_latency = []
+        self.action_latency = []
+        self.actions = 0
+
+    def on_call(self, method, params, result):
+        now = time.perf_counter()
+        chat_id = int(params['chat_id']) if 'chat_id' in params else None
+
+        if method == 'answerCallbackQuery':
+            sent_at = self.pending_callbacks.pop(params.get('callback_query_id'), None)
+            if sent_at is not None:
+                self.action_latency.append(now - sent_at)
+            return
+
+        reply_to = params.get('reply_to_message_id') or (params.get('reply_parameters') or {}).get('message_id')
+        if reply_to is not None:
+            sent_at = self.pending_commands.pop(int(reply_to), None)
+            if sent_at is not None:
+                self.command_latency.append(now - sent_at)
+
+        text = params.get('text') or params.get('caption') or ''
+        if chat_id in self.groups and any(marker in text for marker in ENDING_MARKERS):
+            self.games_finished += 1
+            asyncio.get_running_loop().call_later(1, self.join_all, chat_id)
+
+        markup = params.get('reply_markup')
+        if any(marker in text for marker in CONFIRMATION_MARKERS):
+            return
+        if chat_id is not None and chat_id > 0 and markup and 'inline_keyboard' in markup:
+            buttons = [button['callback_data'] for row in markup['inline_keyboard'] for button in row
+                       if button.get('callback_data')]
+            message_id = result['message_id'] if isinstance(result, dict) else int(params.get('message_id', 0))
+            if buttons:
+                delay = self.rng.uniform(*self.think_time)
+                asyncio.get_running_loop().call_later(delay, self.click, chat_id, self.rng.choice(buttons), message_id)
+
+    def click(self, user_id, data, message_id):
+        query_id = self.server.push_callback(user_id, self.names.get(user_id, 'Player'), data, message_id)
+        self.pending_callbacks[query_id] = time.perf_counter()
+        self.actions += 1
+
+async def scrape_gauge(port, name):
+    """Read a gauge, summed over the workers' samples when the bot is sharded"""
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{port}/metrics", timeout=aiohttp.ClientTimeout(total=2)) as response:
+                values = [float(line.rsplit(' ', 1)[1]) for line in (await response.text()).splitlines()
+                          if line.startswith(name + ' ') or line.startswith(name + '{')]
+                if values:
+                    return sum(values)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+    return float('nan')
+
+async def run(args):
+    server = FakeTelegramServer(args.latency, args.error_rate, args.flood_rate, seed=args.seed)
+    await server.start(port=args.api_port)
+    test = LoadTest(server, args.players, (args.think_min, args.think_max), args.seed)
+
+    # Every file the bot writes goes to a scratch directory: fake lobbies, logs and file_ids
+    # left in the bot's own directory would be picked up by the next real run
+    state_dir = tempfile.mkdtemp(prefix='shadowcourt-loadtest-')
+    env = dict(
+        os.environ,
+        BOT_TOKEN='123456:LOADTEST',
+        TELEGRAM_API_URL=f"http://127.0.0.1:{args.api_port}",
+        PORT=str(args.health_port),
+        GIF_CACHE_PATH=os.path.join(state_dir, 'gif_cache.json'),
+        SESSION_DB_PATH=os.path.join(state_dir, 'sessions.db'),
+        GAME_LOG_DIR=os.path.join(state_dir, 'game_logs'),
+        STATS_DB_PATH=os.path.join(state_dir, 'stats.db'),
+        DM_GLOBAL_RATE=str(args.dm_rate),
+        WORKERS=str(args.workers)
+    )
+    bot_dir = os.path.dirname(os.path.abspath(__file__))
+    bot = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.join(bot_dir, 'bot.py'), cwd=bot_dir, env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=None if args.verbose else asyncio.subprocess.DEVNULL
+    )
+
+    print(f"{'groups':>6} {'sessions':>8} {'games':>5} {'api/s':>7} {'acts/s':>7} "
+          f"{'cmd p50':>8} {'cmd p99':>8} {'act p50':>8} {'act p99':>8} {'rss MB':>7}")
+    try:
+        await asyncio.sleep(2)  # Let the bot connect and start polling
+        for target in args.groups:
+            test.add_groups(target - len(test.groups))
+            test.reset_samples()
+            calls_before = sum(server.call_counts.values())
+            started = time.perf_counter()
+            await asyncio.sleep(args.stage_seconds)
+            elapsed = time.perf_counter() - started
+
+            calls = sum(server.call_counts.values()) - calls_before
+            sessions = await scrape_gauge(args.health_port, 'shadowcourt_active_sessions')
+            print(f"{len(test.groups):>6} {sessions:>8.0f} {test.games_finished:>5} {calls / elapsed:>7.1f} "
+                  f"{test.actions / elapsed:>7.1f} "
+                  f"{1000 * percentile(test.command_latency, 50):>6.0f}ms {1000 * percentile(test.command_latency, 99):>6.0f}ms "
+                  f"{1000 * percentile(test.action_latency, 50):>6.0f}ms {1000 * percentile(test.action_latency, 99):>6.0f}ms "
+                  f"{rss_mb(bot.pid):>7.1f}", flush=True)
+    finally:
+        bot.terminate()
+        await bot.wait()
+        await server.stop()
+    print(f"API calls by method: {dict(sorted(server.call_counts.items()))}")
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test against a local fake Telegram Bot API")
+    parser.add_argument('--groups', default='5,20,50', help="comma-separated cumulative group counts, one stage each")
+    parser.add_argument('--players', type=int, default=6, help="players per group")
+    parser.add_argument('--stage-seconds', type=float, default=60)
+    parser.add_argument('--think-min', type=float, default=0.5, help="min seconds before a player presses a button")
+    parser.add_argument('--think-max', type=float, default=3.0)
+    parser.add_argument('--latency', type=float, default=0.05, help="mean injected API latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of sends failing with 400")
+    parser.add_argument('--flood-rate', type=float, default=0.0, help="fraction of sends rejected with 429")
+    parser.add_argument('--dm-rate', type=float, default=1000, help="bot's global DM rate limit during the test")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes to shard sessions across")
+    parser.add_argument('--api-port', type=int, default=8081)
+    parser.add_argument('--health-port', type=int, default=8090)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help="show the bot's log output")
+    args = parser.parse_args()
+    args.groups = [int(n) for n in args.groups.split(',')]
+    asyncio.run(run(args))
+
+if __name__ == '__main__':
+    main()
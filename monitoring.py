@@ -0,0 +1,210 @@
+import time
+import asyncio
+import logging
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # {label_values: float}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time"""
+
+    def __init__(self, name, help_text, read):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {self.read()}"]
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}  # {label_values: [bucket_counts, sum, count]}
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (bucket_counts, total, count) in self.series.items():
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class Metrics:
+    """Process-wide metrics rendered in Prometheus text format"""
+
+    def __init__(self):
+        self.collectors = []
+        self.phase_duration = self.histogram(
+            'shadowcourt_phase_duration_seconds', 'Time spent in each game phase', ['phase'])
+        self.dm_send_latency = self.histogram(
+            'shadowcourt_dm_send_seconds', 'Latency of DM sends including rate-limit waits')
+        self.dm_failures = self.counter(
+            'shadowcourt_dm_failures_total', 'DM sends that failed after retries', ['reason'])
+        self.update_lag = self.histogram(
+            'shadowcourt_update_lag_seconds', 'Delay between a Telegram message and its handling')
+        self.updates = self.counter('shadowcourt_updates_total', 'Updates received')
+
+    def counter(self, name, help_text, labelnames=()):
+        collector = Counter(name, help_text, labelnames)
+        self.collectors.append(collector)
+        return collector
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        collector = Histogram(name, help_text, labelnames, buckets)
+        self.collectors.append(collector)
+        return collector
+
+    def gauge(self, name, help_text, read):
+        collector = Gauge(name, help_text, read)
+        self.collectors.append(collector)
+        return collector
+
+    def render(self):
+        lines = []
+        for collector in self.collectors:
+            lines.extend(collector.render())
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+def merge_expositions(texts, label='worker'):
+    """Combine several processes' /metrics output into one, labelling each sample with its source index"""
+    families = {}  # {family name: (header lines, sample lines)}, in first-seen order
+    for index, text in enumerate(texts):
+        if text is None:
+            continue
+        family = None
+        for line in text.splitlines():
+            if line.startswith('# '):
+                name = line.split(' ', 3)[2]
+                family = families.setdefault(name, ([], []))
+                if line not in family[0]:
+                    family[0].append(line)
+            elif line and family is not None:
+                space = line.index(' ')
+                brace = line.find('{', 0, space)
+                if brace >= 0:
+                    family[1].append(f'{line[:brace + 1]}{label}="{index}",{line[brace + 1:]}')
+                else:
+                    family[1].append(f'{line[:space]}{{{label}="{index}"}}{line[space:]}')
+    lines = []
+    for headers, samples in families.values():
+        lines.extend(headers)
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+class HealthServer:
+    """In-process aiohttp server for /health and /metrics on the container port.
+
+    Sharded workers pass `path` to listen on a Unix socket instead; the
+    ingress serves the container port and aggregates them.
+    """
+
+    def __init__(self, port, heartbeat_interval=1.0, stale_after=10.0, path=None):
+        self.port = port
+        self.path = path
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.started = time.time()
+        self.last_heartbeat = None
+        self.last_update_time = None
+        self.loop_lag = 0.0
+        self.app = web.Application()
+        self.app.router.add_get('/health', self.handle_health)
+        self.app.router.add_get('/metrics', self.handle_metrics)
+        self._runner = None
+        self._heartbeat_task = None
+        metrics.gauge('shadowcourt_event_loop_lag_seconds', 'Event loop scheduling delay', lambda: self.loop_lag)
+
+    def record_update(self, sent_at=None):
+        """Note that an update was handled, with its Telegram timestamp when known"""
+        now = time.time()
+        self.last_update_time = now
+        metrics.updates.inc()
+        if sent_at is not None:
+            metrics.update_lag.observe(max(0.0, now - sent_at.timestamp()))
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        if self.path:
+            await web.UnixSite(self._runner, self.path).start()
+        else:
+            await web.TCPSite(self._runner, '0.0.0.0', self.port).start()
+        self.last_heartbeat = time.time()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        logger.info(f"Health server listening on {self.path or f'port {self.port}'}")
+
+    async def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _heartbeat(self):
+        # The sleep overshoot is how long the loop was too busy to wake us
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.heartbeat_interval
+            await asyncio.sleep(self.heartbeat_interval)
+            self.loop_lag = max(0.0, loop.time() - expected)
+            self.last_heartbeat = time.time()
+
+    async def handle_health(self, request):
+        now = time.time()
+        alive = self.last_heartbeat is not None and now - self.last_heartbeat < self.stale_after
+        body = {
+            'status': 'ok' if alive else 'stalled',
+            'uptime_seconds': round(now - self.started, 1),
+            'event_loop_lag_seconds': round(self.loop_lag, 4),
+            'last_update_time': self.last_update_time,
+            'seconds_since_last_update': round(now - self.last_update_time, 1) if self.last_update_time else None,
+        }
+        return web.json_response(body, status=200 if alive else 503)
+
+    async def handle_metrics(self, request):
+        return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
@@ -0,0 +1,82 @@
+import heapq
+import asyncio
+import logging
+import itertools
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Telegram's limits for a caption and for a plain message
+CAPTION_LIMIT = 1024
+TEXT_LIMIT = 4096
+
+# send(text, gif_key) -> awaitable; gif_key is None for plain text
+Outgoing = namedtuple('Outgoing', 'priority seq text gif_key send')
+
+class Outbox:
+    """Background per-chat send queues so game timing never waits on Telegram.
+
+    post() returns immediately. Each chat with pending posts gets one worker
+    that sends them in priority order, then in the order they were posted.
+    Posts that pile up behind a slow send are coalesced: consecutive posts of
+    the same priority and kind are joined into one message when the result
+    still fits Telegram's length limit, keeping the later post's GIF.
+    """
+
+    def __init__(self):
+        self._queues = {}  # {chat_id: heap of Outgoing}
+        self._workers = {}  # {chat_id: Task}
+        self._seq = itertools.count()
+
+    def post(self, chat_id, priority, text, send, gif_key=None):
+        queue = self._queues.setdefault(chat_id, [])
+        heapq.heappush(queue, Outgoing(priority, next(self._seq), text, gif_key, send))
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._drain(chat_id))
+
+    def pending(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _next(self, queue):
+        """Pop the next post, folding in any mergeable posts queued right behind it"""
+        item = heapq.heappop(queue)
+        limit = TEXT_LIMIT if item.gif_key is None else CAPTION_LIMIT
+        while queue:
+            following = queue[0]
+            if following.priority != item.priority or (following.gif_key is None) != (item.gif_key is None):
+                break
+            text = f"{item.text.rstrip()}\n\n{following.text.strip()}"
+            if len(text) > limit:
+                break
+            heapq.heappop(queue)
+            item = item._replace(text=text, gif_key=following.gif_key, send=following.send)
+        return item
+
+    async def _drain(self, chat_id):
+        queue = self._queues[chat_id]
+        try:
+            while queue:
+                item = self._next(queue)
+                try:
+                    await item.send(item.text, item.gif_key)
+                except Exception as e:
+                    logger.error(f"Failed to deliver queued message to {chat_id}: {e}")
+        finally:
+            if self._workers.get(chat_id) is asyncio.current_task():
+                del self._queues[chat_id]
+                del self._workers[chat_id]
+
+    def discard(self, chat_ids):
+        """Drop everything still queued for these chats and cancel the send in progress"""
+        for chat_id in chat_ids:
+            queue = self._queues.pop(chat_id, None)
+            if queue is not None:
+                queue.clear()
+            worker = self._workers.pop(chat_id, None)
+            if worker is not None:
+                worker.cancel()
+
+    async def close(self):
+        """Wait for every queued post to be sent"""
+        while self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
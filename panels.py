@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from functools import partial
+from telegram.error import BadRequest
+from fanout import PRIORITY_ACTION
+
+logger = logging.getLogger(__name__)
+
+class ActionPanels:
+    """One persistent DM per player that every phase edits in place.
+
+    show() puts a phase's prompt and buttons on a player's panel, sending it
+    the first time and editing it after that. edit() queues a follow-up change
+    such as a vote confirmation or a keyboard page turn; edits arriving within
+    `window` seconds of each other are coalesced so only the newest content
+    reaches Telegram.
+    Everything goes through the shared DMFanout rate limits.
+    """
+
+    def __init__(self, fanout, window=0.5):
+        self.fanout = fanout
+        self.window = window
+        self.message_ids = {}  # {chat_id: message_id of the player's panel}
+        self._queued = {}  # {chat_id: (bot, kwargs)} newest edit waiting for the window to close
+        self._timers = {}  # {chat_id: TimerHandle}
+        self._inflight = {}  # {chat_id: Task} edits already handed to Telegram
+
+    async def show(self, bot, chat_id, **kwargs):
+        """Replace a player's panel content now, superseding any queued edit"""
+        timer = self._timers.pop(chat_id, None)
+        if timer is not None:
+            timer.cancel()
+        self._queued.pop(chat_id, None)
+        inflight = self._inflight.get(chat_id)
+        if inflight is not None:
+            # Let an older edit land first so it can't overwrite the new content
+            await asyncio.gather(inflight, return_exceptions=True)
+
+        message_id = self.message_ids.get(chat_id)
+        if message_id is not None:
+            try:
+                return await self.fanout.send(bot.edit_message_text, chat_id, PRIORITY_ACTION, message_id=message_id, **kwargs)
+            except BadRequest as e:
+                if 'not modified' in str(e).lower():
+                    return True
+                # Deleted by the player or no longer editable; start a fresh panel
+                logger.info(f"Panel for {chat_id} could not be edited ({e}), sending a new one")
+        message = await self.fanout.send(bot.send_message, chat_id, PRIORITY_ACTION, **kwargs)
+        self.message_ids[chat_id] = message.message_id
+        return message
+
+    async def show_many(self, bot, panels):
+        """Show {chat_id: kwargs} concurrently; returns {chat_id: result or Exception}"""
+        chat_ids = list(panels)
+        results = await asyncio.gather(
+            *(self.show(bot, chat_id, **panels[chat_id]) for chat_id in chat_ids),
+            return_exceptions=True
+        )
+        return dict(zip(chat_ids, results))
+
+    def edit(self, bot, chat_id, message_id, **kwargs):
+        """Queue an edit to a player's panel, coalescing with others inside the window.
+
+        `message_id` is the message the player pressed a button on; it becomes
+        the panel if none is known (e.g. after a restart). Without `text` only
+        the buttons change. A newer edit overrides the fields it sets and
+        keeps the rest of the one it coalesces with.
+        """
+        self.message_ids.setdefault(chat_id, message_id)
+        queued = self._queued.get(chat_id)
+        if queued is None:
+            self._timers[chat_id] = asyncio.get_running_loop().call_later(self.window, self._flush, chat_id)
+        else:
+            kwargs = {**queued[1], **kwargs}
+        self._queued[chat_id] = (bot, kwargs)
+
+    def _flush(self, chat_id):
+        self._timers.pop(chat_id, None)
+        queued = self._queued.pop(chat_id, None)
+        if queued is None:
+            return
+        bot, kwargs = queued
+        message_id = self.message_ids.get(chat_id)
+        if message_id is None:
+            return
+        task = self._inflight[chat_id] = asyncio.create_task(self._send_edit(bot, chat_id, message_id, kwargs))
+        task.add_done_callback(partial(self._edit_done, chat_id))
+
+    def _edit_done(self, chat_id, task):
+        if self._inflight.get(chat_id) is task:
+            del self._inflight[chat_id]
+
+    async def _send_edit(self, bot, chat_id, message_id, kwargs):
+        method = bot.edit_message_text if 'text' in kwargs else bot.edit_message_reply_markup
+        try:
+            await self.fanout.send(method, chat_id, PRIORITY_ACTION, message_id=message_id, **kwargs)
+        except BadRequest as e:
+            if 'not modified' not in str(e).lower():
+                logger.warning(f"Failed to update panel for {chat_id}: {e}")
+        except Exception as e:
+            logger.warning(f"Failed to update panel for {chat_id}: {e}")
+
+    def discard(self, chat_ids):
+        """Forget the panels of players whose game is over and drop their pending edits"""
+        for chat_id in chat_ids:
+            self.message_ids.pop(chat_id, None)
+            self._queued.pop(chat_id, None)
+            timer = self._timers.pop(chat_id, None)
+            if timer is not None:
+                timer.cancel()
+            inflight = self._inflight.pop(chat_id, None)
+            if inflight is not None:
+                inflight.cancel()
+
+    async def close(self):
+        """Send every queued edit now and wait for edits in flight"""
+        for chat_id in list(self._queued):
+            self._timers.pop(chat_id).cancel()
+            self._flush(chat_id)
+        if self._inflight:
+            await asyncio.gather(*self._inflight.values(), return_exceptions=True)
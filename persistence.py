@@ -0,0 +1,106 @@
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class SessionStore:
+    """SQLite-backed snapshots of every live session.
+
+    Handlers only mark a session dirty. A flush task snapshots dirty sessions
+    on the event loop once per interval and hands the whole batch to a single
+    writer thread, so disk I/O never blocks update handling.
+
+    A shutdown checkpoint also stores when each session's next phase is due
+    (`resume_at`, Unix time) so a restarted bot keeps the same deadlines.
+    Any ordinary save clears it again.
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._dirty = {}  # {chat_id: (GameState, resume_at), or None to delete}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='session-store')
+        self._conn = None
+        self._flush_task = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "chat_id INTEGER PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL, resume_at REAL)"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if 'resume_at' not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN resume_at REAL")
+        conn.commit()
+        self._conn = conn
+        return {
+            chat_id: (json.loads(state), resume_at)
+            for chat_id, state, resume_at in conn.execute("SELECT chat_id, state, resume_at FROM sessions")
+        }
+
+    def _write_batch(self, upserts, deletes):
+        now = time.time()
+        with self._conn:
+            if upserts:
+                self._conn.executemany(
+                    "INSERT INTO sessions (chat_id, state, updated_at, resume_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(chat_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at, "
+                    "resume_at = excluded.resume_at",
+                    [(chat_id, state, now, resume_at) for chat_id, state, resume_at in upserts]
+                )
+            if deletes:
+                self._conn.executemany("DELETE FROM sessions WHERE chat_id = ?", [(chat_id,) for chat_id in deletes])
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def open(self):
+        """Open the database and return every stored snapshot as {chat_id: (dict, resume_at or None)}"""
+        stored = await self._run(self._connect)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Session store {self.path} holds {len(stored)} session(s)")
+        return stored
+
+    def save(self, game, resume_at=None):
+        """Queue a session for the next batched write, with its next phase's due time when checkpointing"""
+        self._dirty[game.group_chat_id] = (game, resume_at)
+
+    def delete(self, chat_id):
+        self._dirty[chat_id] = None
+
+    async def flush(self):
+        if not self._dirty or self._conn is None:
+            return
+        dirty, self._dirty = self._dirty, {}
+        # Snapshot on the loop thread so the writer never sees a half-updated game
+        upserts = [(chat_id, json.dumps(entry[0].to_dict()), entry[1]) for chat_id, entry in dirty.items() if entry is not None]
+        deletes = [chat_id for chat_id, entry in dirty.items() if entry is None]
+        try:
+            await self._run(self._write_batch, upserts, deletes)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to persist {len(dirty)} session(s): {e}")
+            # Keep newer changes that arrived while writing, retry the rest next time
+            self._dirty = {**dirty, **self._dirty}
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self):
+        """Write out anything pending and release the database"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,78 @@
+import time
+import logging
+from telegram.constants import ChatAction
+from telegram.error import BadRequest, Forbidden
+from fanout import PRIORITY_ACTION
+
+logger = logging.getLogger(__name__)
+
+def is_unreachable_error(error):
+    """Whether a failed DM means the user can't be messaged at all, rather than a passing fault"""
+    if isinstance(error, Forbidden):
+        return True  # Never started the bot, or blocked it
+    return isinstance(error, BadRequest) and 'chat not found' in str(error).lower()
+
+class DMReachability:
+    """Cache of which users the bot can send private messages to.
+
+    Telegram only lets a bot DM users who have started a private chat with it.
+    check() probes a user with a chat action and trusts a success for `ttl`
+    seconds. Failures are remembered for `unreachable_ttl` seconds so DM
+    fan-outs skip the user, but check() probes them again: they may have
+    pressed Start since, on a worker that doesn't share this cache. Every
+    DM fan-out also reports its results here, so a player who blocks the bot
+    mid-game stops costing API calls on the next phase.
+    """
+
+    def __init__(self, ttl=3600, unreachable_ttl=300, max_entries=10000):
+        self.ttl = ttl
+        self.unreachable_ttl = unreachable_ttl
+        self.max_entries = max_entries
+        self._entries = {}  # {user_id: (reachable, expires_at)}
+
+    def get(self, user_id):
+        """True or False while a cached answer is fresh, otherwise None"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        reachable, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[user_id]
+            return None
+        return reachable
+
+    def is_unreachable(self, user_id):
+        return self.get(user_id) is False
+
+    def mark(self, user_id, reachable):
+        if len(self._entries) >= self.max_entries and user_id not in self._entries:
+            self._prune()
+        ttl = self.ttl if reachable else self.unreachable_ttl
+        self._entries[user_id] = (reachable, time.monotonic() + ttl)
+
+    def observe(self, user_id, result):
+        """Learn from the outcome of a DM: a Message (or True) or the exception it raised"""
+        if not isinstance(result, Exception):
+            self.mark(user_id, True)
+        elif is_unreachable_error(result):
+            self.mark(user_id, False)
+
+    def _prune(self):
+        now = time.monotonic()
+        for user_id in [uid for uid, (_, expires_at) in self._entries.items() if now >= expires_at]:
+            del self._entries[user_id]
+
+    async def check(self, fanout, bot, user_id):
+        """Probe a user unless they are known to be reachable; None if the probe itself failed"""
+        if self.get(user_id):
+            return True
+        try:
+            await fanout.send(bot.send_chat_action, user_id, PRIORITY_ACTION, action=ChatAction.TYPING)
+        except Exception as e:
+            if not is_unreachable_error(e):
+                logger.warning(f"Could not check whether {user_id} accepts DMs: {e}")
+                return None
+            self.mark(user_id, False)
+            return False
+        self.mark(user_id, True)
+        return True
@@ -0,0 +1,88 @@
+import sys
+import json
+import time
+import cProfile
+import pstats
+import argparse
+from datetime import datetime
+
+import engine
+from engine import GameState
+from event_log import LOG_VERSION, state_digest
+
+class ReplayError(Exception):
+    """The log does not reproduce: the rules or the log have diverged"""
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def replay(records, until=None, verify=True):
+    """Rebuild a game from its log records through the rule engine; returns the final GameState"""
+    state = None
+    for index, (_, kind, *fields) in enumerate(records[:until]):
+        if kind == 'game':
+            version, game_id, chat_id, seed = fields
+            if version != LOG_VERSION:
+                raise ReplayError(f"record {index}: unsupported log version {version}")
+            state = GameState(chat_id)
+            state.game_id = game_id
+            state.seed = seed
+        elif state is None:
+            raise ReplayError(f"record {index}: log does not start with a game header")
+        elif kind == 'join':
+            player_id, name, username, join_time = fields
+            engine.add_player(state, player_id, name, username, datetime.fromisoformat(join_time))
+        elif kind == 'phase':
+            phase, started, digest = fields
+            state.phase = phase
+            state.phase_start_time = datetime.fromisoformat(started)
+            engine.apply_phase(state, phase)
+            if verify and state_digest(state) != digest:
+                raise ReplayError(f"record {index}: state diverged entering {phase} on day {state.day_number}")
+        elif kind == 'roles':
+            dealt = {player_id: player.role for player_id, player in state.players.items()}
+            if verify and dealt != dict(map(tuple, fields[0])):
+                raise ReplayError(f"record {index}: roles dealt differently from the log")
+        elif kind == 'expect':
+            state.expected_actors = set(fields[0])
+        elif kind == 'act':
+            engine.submit_night_action(state, *fields)
+        elif kind == 'vote':
+            engine.submit_vote(state, *fields)
+        elif kind == 'end':
+            break
+    return state
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild a Shadow Court game from its event log")
+    parser.add_argument('log', help="path to a game log written by the bot (GAME_LOG_DIR/<game_id>.jsonl)")
+    parser.add_argument('--until', type=int, help="stop after this many records and dump the state there")
+    parser.add_argument('--repeat', type=int, default=1, help="replay this many times and report throughput")
+    parser.add_argument('--profile', action='store_true', help="run the replays under cProfile")
+    parser.add_argument('--no-verify', action='store_true', help="skip the per-phase state digest checks")
+    args = parser.parse_args()
+
+    records = load(args.log)
+    profiler = cProfile.Profile() if args.profile else None
+    started = time.perf_counter()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        for _ in range(args.repeat):
+            state = replay(records, args.until, verify=not args.no_verify)
+        if profiler is not None:
+            profiler.disable()
+    except ReplayError as e:
+        sys.exit(f"Replay failed: {e}")
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps(state.to_dict(), sort_keys=True, indent=2, ensure_ascii=False))
+    if args.repeat > 1:
+        print(f"{args.repeat} replays of {len(records)} records in {elapsed:.2f}s "
+              f"({args.repeat / elapsed:,.0f} games/s)", file=sys.stderr)
+    if profiler is not None:
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(20)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import asyncio
+import heapq
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PhaseScheduler:
+    """Deadline heap that drives every session's phase transitions.
+
+    Each session key has at most one pending transition. A single runner task
+    sleeps until the earliest deadline and then launches the due callbacks as
+    independent tasks, so phase handlers never await each other and the call
+    stack stays flat no matter how long a game runs.
+    """
+
+    def __init__(self):
+        self._heap = []  # [(deadline, seq, key)]
+        self._pending = {}  # {key: (deadline, seq, callback, args)}
+        self._running = {}  # {key: asyncio.Task} transitions currently executing
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner = None
+        self._draining = False
+
+    def schedule(self, key, delay, callback, *args):
+        """Run callback(*args) for key after delay seconds, replacing any pending transition"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + delay
+        seq = next(self._seq)
+        self._pending[key] = (deadline, seq, callback, args)
+        heapq.heappush(self._heap, (deadline, seq, key))
+
+        if self._draining:
+            return deadline  # Recorded for the checkpoint, never fired
+        if self._runner is None or self._runner.done():
+            self._runner = loop.create_task(self._run())
+        elif self._heap[0][1] == seq:
+            self._wakeup.set()
+        return deadline
+
+    def cancel(self, key):
+        """Drop the pending transition for key and stop one that is mid-flight"""
+        # Stale heap entries are skipped lazily by the runner
+        self._pending.pop(key, None)
+        task = self._running.get(key)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+    def deadline(self, key):
+        """Loop time at which key's next transition fires, or None"""
+        entry = self._pending.get(key)
+        return entry[0] if entry else None
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def drain(self, timeout):
+        """Stop firing transitions and give those mid-flight up to timeout seconds to finish.
+
+        Pending deadlines are kept so they can still be read for a checkpoint;
+        call stop() afterwards.
+        """
+        self._draining = True
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        running = list(self._running.values())
+        if not running:
+            return
+        _, late = await asyncio.wait(running, timeout=timeout)
+        if late:
+            logger.warning(f"Cancelling {len(late)} phase transition(s) still running after {timeout}s")
+            for task in late:
+                task.cancel()
+            await asyncio.gather(*late, return_exceptions=True)
+
+    async def stop(self):
+        """Cancel the runner and every in-flight transition"""
+        tasks = list(self._running.values())
+        if self._runner is not None:
+            tasks.append(self._runner)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._heap.clear()
+        self._pending.clear()
+        self._runner = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._heap:
+            deadline, seq, key = self._heap[0]
+            entry = self._pending.get(key)
+            if entry is None or entry[1] != seq:
+                heapq.heappop(self._heap)
+                continue
+
+            delay = deadline - loop.time()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            del self._pending[key]
+            _, _, callback, args = entry
+            previous = self._running.get(key)
+            if previous is not None:
+                previous.cancel()  # A session never has two transitions running at once
+            task = loop.create_task(self._fire(key, callback, args))
+            self._running[key] = task
+
+    async def _fire(self, key, callback, args):
+        try:
+            await callback(*args)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"Phase transition for session {key} failed")
+        finally:
+            if self._running.get(key) is asyncio.current_task():
+                del self._running[key]
@@ -0,0 +1,346 @@
+import os
+import sys
+import hmac
+import bisect
+import signal
+import asyncio
+import hashlib
+import logging
+import aiohttp
+from functools import partial
+from aiohttp import web
+from telegram import Update
+import callbacks
+from monitoring import merge_expositions
+from webhook import SECRET_HEADER
+
+logger = logging.getLogger(__name__)
+
+UPDATE_PATH = '/update'  # Where workers accept forwarded updates on their socket
+SEAT_PATH = '/seat'  # Where workers report which group a user is seated in
+FORWARD_TIMEOUT = aiohttp.ClientTimeout(total=10)
+HEALTH_TIMEOUT = aiohttp.ClientTimeout(total=2)
+POLL_TIMEOUT = 30
+
+def _point(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+class HashRing:
+    """Consistent hash ring assigning session keys (group chat ids) to worker indexes.
+
+    Each worker holds `replicas` points on the ring, so keys spread evenly and
+    changing the number of workers only moves about 1/N of the sessions.
+    """
+
+    def __init__(self, workers, replicas=128):
+        points = sorted((_point(f"worker-{worker}-{replica}"), worker)
+                        for worker in range(workers) for replica in range(replicas))
+        self.workers = workers
+        self._points = [point for point, _ in points]
+        self._owners = [worker for _, worker in points]
+
+    def owner(self, key):
+        index = bisect.bisect(self._points, _point(str(key))) % len(self._points)
+        return self._owners[index]
+
+def worker_socket_paths(socket_dir, workers):
+    return [os.path.join(socket_dir, f"shadowcourt-worker-{worker}.sock") for worker in range(workers)]
+
+def session_key(update):
+    """Group chat id whose session a raw update belongs to, or None if only the sender is known.
+
+    Group updates carry it in their chat and game buttons encode it in their
+    callback_data. Other private updates have to be looked up by sender.
+    """
+    query = update.get('callback_query')
+    if query is not None:
+        callback = callbacks.decode(query.get('data'))
+        return callback.chat_id if callback is not None else None
+    for payload in update.values():
+        if isinstance(payload, dict):
+            chat = payload.get('chat')
+            if chat is not None and chat.get('type') != 'private':
+                return chat['id']
+            return None
+    return 0
+
+def sender_id(update):
+    for payload in update.values():
+        if isinstance(payload, dict):
+            user = payload.get('from') or payload.get('chat')
+            return user['id'] if user is not None else 0
+    return 0
+
+def register_seat_lookup(app, lookup):
+    """Serve SEAT_PATH from a worker's own registry; lookup(user_id) gives a group chat id or None"""
+    async def handle(request):
+        try:
+            user_id = int(request.query['user'])
+        except (KeyError, ValueError):
+            return web.Response(status=400)
+        return web.json_response({'chat_id': lookup(user_id)})
+    app.router.add_get(SEAT_PATH, handle)
+
+class SeatDirectory:
+    """Asks workers which group chat a user is seated in.
+
+    A worker only reports a seat once it has admitted the player, so a
+    refused /join never sends that user's private commands astray. The
+    ingress routes private updates with it and workers use it to refuse a
+    player seated on another worker. Two /joins from one user landing on
+    different workers at the same moment can still both be admitted; the
+    check runs again after the DM probe, which narrows that to one lookup.
+    """
+
+    def __init__(self, socket_paths):
+        self.socket_paths = socket_paths
+        self._sessions = []
+
+    async def start(self):
+        self._sessions = [aiohttp.ClientSession(connector=aiohttp.UnixConnector(path=path))
+                          for path in self.socket_paths]
+
+    async def close(self):
+        for session in self._sessions:
+            await session.close()
+        self._sessions = []
+
+    async def _ask(self, session, user_id):
+        try:
+            async with session.get(f"http://worker{SEAT_PATH}", params={'user': user_id},
+                                   timeout=HEALTH_TIMEOUT) as response:
+                if response.status != 200:
+                    return None
+                return (await response.json()).get('chat_id')
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError):
+            return None
+
+    async def seat(self, user_id):
+        """Group chat id the user is seated in on any of these workers, or None"""
+        if not self._sessions:
+            return None
+        results = await asyncio.gather(*(self._ask(session, user_id) for session in self._sessions))
+        return next((chat_id for chat_id in results if chat_id is not None), None)
+
+class ShardIngress:
+    """Front process that owns no games and routes every update to the worker owning its session.
+
+    Workers are bot.py processes in BOT_MODE=worker listening on Unix sockets,
+    each with its own Application, so every session keeps a single writer
+    while the sessions spread across cores. Updates arrive by webhook or by
+    polling and are forwarded as raw JSON, in order per worker. Private
+    updates go to the worker that has seated their sender. An update a
+    worker can't take is offered again: webhook posts get a 503 so Telegram
+    redelivers, polled updates are retried before the offset moves on.
+    """
+
+    def __init__(self, token, socket_paths, api_url=None, secret_token=None):
+        self.token = token
+        self.socket_paths = socket_paths
+        self.api_url = (api_url or 'https://api.telegram.org').rstrip('/')
+        self.secret_token = secret_token
+        self.ring = HashRing(len(socket_paths))
+        self.seats = SeatDirectory(socket_paths)
+        self.accepting = True
+        self._workers = []  # aiohttp sessions, one per worker socket
+        self._api = None
+
+    async def start(self):
+        self._workers = [aiohttp.ClientSession(connector=aiohttp.UnixConnector(path=path))
+                         for path in self.socket_paths]
+        self._api = aiohttp.ClientSession()
+        await self.seats.start()
+
+    async def close(self):
+        for session in [*self._workers, self._api]:
+            if session is not None:
+                await session.close()
+        await self.seats.close()
+
+    async def route(self, update):
+        """Index of the worker owning an update's session; private ones follow their sender's seat"""
+        key = session_key(update)
+        if key is None:
+            user_id = sender_id(update)
+            key = await self.seats.seat(user_id) or user_id
+        return self.ring.owner(key)
+
+    async def _post(self, worker, update):
+        """Hand one update to a worker; its HTTP status, or 503 while it is down or restarting"""
+        try:
+            async with self._workers[worker].post(f"http://worker{UPDATE_PATH}", json=update,
+                                                  timeout=FORWARD_TIMEOUT) as response:
+                return response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            logger.warning(f"Worker {worker} is not taking updates: {e}")
+            return 503
+
+    async def _get(self, worker, path):
+        try:
+            async with self._workers[worker].get(f"http://worker{path}", timeout=HEALTH_TIMEOUT) as response:
+                return response.status, await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+            return None, None
+
+    async def wait_ready(self, timeout):
+        """Wait until every worker answers its health check"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        for worker in range(len(self.socket_paths)):
+            while (await self._get(worker, '/health'))[0] != 200:
+                if loop.time() > deadline:
+                    raise RuntimeError(f"Worker {worker} did not start within {timeout}s")
+                await asyncio.sleep(0.2)
+
+    # Telegram
+
+    async def call(self, method, **params):
+        async with self._api.post(f"{self.api_url}/bot{self.token}/{method}", json=params,
+                                  timeout=aiohttp.ClientTimeout(total=POLL_TIMEOUT + 10)) as response:
+            body = await response.json()
+        if not body.get('ok'):
+            raise RuntimeError(f"{method} failed: {body.get('description')}")
+        return body['result']
+
+    async def handle_webhook(self, request):
+        if self.secret_token is not None:
+            supplied = request.headers.get(SECRET_HEADER, '')
+            if not hmac.compare_digest(supplied.encode(), self.secret_token.encode()):
+                return web.Response(status=403)
+        if not self.accepting:
+            return web.Response(status=503, headers={'Retry-After': '1'})
+        try:
+            update = await request.json()
+        except ValueError as e:
+            logger.warning(f"Rejected malformed webhook payload: {e}")
+            return web.Response(status=400)
+
+        status = await self._post(await self.route(update), update)
+        if status == 503:
+            return web.Response(status=503, headers={'Retry-After': '1'})
+        return web.Response(status=status)
+
+    async def _deliver(self, worker, updates):
+        for update in updates:
+            while await self._post(worker, update) == 503:
+                await asyncio.sleep(1)
+
+    async def poll(self):
+        """getUpdates loop; an offset is confirmed only once its whole batch reached the workers"""
+        webhook_deleted = False
+        offset = None
+        while self.accepting:
+            try:
+                if not webhook_deleted:
+                    await self.call('deleteWebhook')
+                    webhook_deleted = True
+                updates = await self.call('getUpdates', offset=offset, timeout=POLL_TIMEOUT,
+                                          allowed_updates=Update.ALL_TYPES)
+            except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError, ValueError) as e:
+                logger.warning(f"Polling failed, retrying: {e}")
+                await asyncio.sleep(1)
+                continue
+            if not updates:
+                continue
+            batches = {}  # {worker: [update, ...]} in arrival order
+            for update in updates:
+                batches.setdefault(await self.route(update), []).append(update)
+            await asyncio.gather(*(self._deliver(worker, batch) for worker, batch in batches.items()))
+            offset = updates[-1]['update_id'] + 1
+
+    # Container health and metrics, aggregated over the workers
+
+    async def handle_health(self, request):
+        results = await asyncio.gather(*(self._get(worker, '/health') for worker in range(len(self.socket_paths))))
+        workers = {str(worker): 'ok' if status == 200 else 'down' for worker, (status, _) in enumerate(results)}
+        healthy = all(state == 'ok' for state in workers.values())
+        return web.json_response({'status': 'ok' if healthy else 'degraded', 'workers': workers},
+                                 status=200 if healthy else 503)
+
+    async def handle_metrics(self, request):
+        results = await asyncio.gather(*(self._get(worker, '/metrics') for worker in range(len(self.socket_paths))))
+        text = merge_expositions([body if status == 200 else None for status, body in results])
+        return web.Response(text=text, content_type='text/plain', charset='utf-8')
+
+def _poller_done(stop, task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Polling stopped: {task.exception()!r}")
+    stop.set()
+
+async def _supervise(worker, command, env, processes, stopping):
+    """Keep one worker process running, restarting it if it dies"""
+    while not stopping.is_set():
+        # Own session: a terminal's Ctrl-C must not reach workers before the ingress stops routing
+        process = await asyncio.create_subprocess_exec(*command, env=env, start_new_session=True)
+        processes[worker] = process
+        code = await process.wait()
+        if not stopping.is_set():
+            logger.error(f"Worker {worker} exited with code {code}, restarting")
+            await asyncio.sleep(1)
+
+async def serve_sharded(token, workers, port, worker_env, socket_dir, api_url=None, webhook_url=None,
+                        webhook_path='/telegram', secret_token=None, max_connections=40,
+                        startup_timeout=60, shutdown_timeout=8):
+    """Run the ingress and `workers` bot.py worker processes until SIGINT/SIGTERM.
+
+    On shutdown the ingress stops taking updates first, then lets every
+    worker drain and checkpoint its sessions before exiting.
+    """
+    socket_paths = worker_socket_paths(socket_dir, workers)
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py')]
+    ingress = ShardIngress(token, socket_paths, api_url, secret_token)
+
+    stop = asyncio.Event()
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    processes = {}
+    supervisors = [
+        asyncio.create_task(_supervise(worker, command, {
+            **worker_env, 'BOT_MODE': 'worker', 'WORKER_INDEX': str(worker), 'WORKER_SOCKET': path
+        }, processes, stopping))
+        for worker, path in enumerate(socket_paths)
+    ]
+
+    app = web.Application()
+    app.router.add_get('/health', ingress.handle_health)
+    app.router.add_get('/metrics', ingress.handle_metrics)
+    if webhook_url:
+        app.router.add_post(webhook_path, ingress.handle_webhook)
+    runner = web.AppRunner(app, access_log=None)
+    poller = None
+    await ingress.start()
+    try:
+        await ingress.wait_ready(startup_timeout)
+        await runner.setup()
+        await web.TCPSite(runner, '0.0.0.0', port).start()
+        if webhook_url:
+            await ingress.call('setWebhook', url=webhook_url.rstrip('/') + webhook_path, secret_token=secret_token,
+                               max_connections=max_connections, allowed_updates=Update.ALL_TYPES)
+            logger.info(f"Routing webhook updates to {workers} workers")
+        else:
+            poller = asyncio.create_task(ingress.poll())
+            # A poller that dies takes the ingress down with it rather than leaving it healthy but deaf
+            poller.add_done_callback(partial(_poller_done, stop))
+            logger.info(f"Routing polled updates to {workers} workers")
+        await stop.wait()
+    finally:
+        ingress.accepting = False
+        if poller is not None:
+            poller.cancel()
+            await asyncio.gather(poller, return_exceptions=True)
+        stopping.set()
+        for process in processes.values():
+            if process.returncode is None:
+                process.terminate()
+        # Workers get their own drain budget plus a little to exit
+        await asyncio.wait(supervisors, timeout=shutdown_timeout + 2)
+        for worker, process in processes.items():
+            if process.returncode is None:
+                logger.warning(f"Worker {worker} did not exit in time, killing it")
+                process.kill()
+        await asyncio.gather(*supervisors, return_exceptions=True)
+        await runner.cleanup()
+        await ingress.close()
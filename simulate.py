@@ -0,0 +1,190 @@
+import os
+import time
+import random
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+from engine import GameState, ROLES
+
+MAX_DAYS = 50  # Safety cap; games still undecided by then are counted as stalemates
+
+class RandomAgent:
+    """Acts and votes uniformly at random, skipping now and then"""
+
+    def __init__(self, rng, skip_rate=0.1):
+        self.rng = rng
+        self.skip_rate = skip_rate
+
+    def night_action(self, state, player_id, targets):
+        if not targets or self.rng.random() < self.skip_rate:
+            return None
+        return self.rng.choice(targets)
+
+    def vote(self, state, voter_id, targets):
+        if not targets or self.rng.random() < self.skip_rate:
+            return "skip"
+        return self.rng.choice(targets)
+
+    def observe(self, state, events):
+        pass
+
+class ScriptedAgent(RandomAgent):
+    """Plays each role's obvious strategy.
+
+    Evil players never target each other, the Guardian shields the Oracle
+    once it is known, and good players pile onto anyone the Oracle has
+    exposed as evil. Everything else falls back to random play.
+    """
+
+    def __init__(self, rng, skip_rate=0.0):
+        super().__init__(rng, skip_rate)
+        self.exposed_evil = set()
+        self.cleared = set()
+
+    def _team(self, state, player_id):
+        return state.players[player_id].team
+
+    def night_action(self, state, player_id, targets):
+        role = state.players[player_id].role
+        if role == 'bloodseeker':
+            targets = [t for t in targets if self._team(state, t) != 'evil'] or targets
+        elif role == 'oracle':
+            targets = [t for t in targets if t != player_id and t not in self.exposed_evil and t not in self.cleared] or targets
+        elif role == 'guardian':
+            oracles = [t for t in targets if state.players[t].role == 'oracle' and t in self.cleared]
+            if oracles:
+                return oracles[0]
+        return super().night_action(state, player_id, targets)
+
+    def vote(self, state, voter_id, targets):
+        if self._team(state, voter_id) == 'evil':
+            targets = [t for t in targets if self._team(state, t) != 'evil'] or targets
+        else:
+            exposed = [t for t in targets if t in self.exposed_evil]
+            if exposed:
+                return exposed[0]
+            targets = [t for t in targets if t not in self.cleared] or targets
+        return super().vote(state, voter_id, targets)
+
+    def observe(self, state, events):
+        # Oracle findings are assumed to be shared with the whole court
+        for event in events:
+            if isinstance(event, engine.Investigated) and state.players[event.investigator_id].alive:
+                (self.exposed_evil if event.team == 'evil' else self.cleared).add(event.target_id)
+                self.cleared.add(event.investigator_id)
+
+AGENTS = {'random': RandomAgent, 'scripted': ScriptedAgent}
+
+def play_game(lineup, rng, agent_name):
+    """Play one game to completion with the given line-up; returns (winner, days, neutral_survived)"""
+    state = GameState()
+    for player_id in range(1, len(lineup) + 1):
+        engine.add_player(state, player_id, f"P{player_id}")
+    engine.start_game(state, rng, roles=lineup)
+    agent = AGENTS[agent_name](rng)
+
+    while state.day_number <= MAX_DAYS:
+        engine.begin_night(state)
+        actions = {}
+        for player_id, player in state.get_alive_players().items():
+            action_type = player.action
+            if not action_type:
+                continue
+            target_id = agent.night_action(state, player_id, engine.night_targets(state, player_id))
+            if target_id is not None:
+                actions.setdefault(action_type, {})[player_id] = target_id
+        _, events = engine.resolve_night(state, actions)
+        agent.observe(state, events)
+        result = engine.check_winner(state)
+        if result is not None:
+            break
+
+        engine.begin_trial(state)
+        votes = {voter_id: agent.vote(state, voter_id, engine.vote_targets(state, voter_id))
+                 for voter_id in state.get_alive_players()}
+        _, events = engine.resolve_trial(state, votes, rng)
+        agent.observe(state, events)
+        engine.end_day(state)
+        result = engine.check_winner(state)
+        if result is not None:
+            break
+        state.day_number += 1
+    else:
+        return 'stalemate', MAX_DAYS, bool(state.count_alive('neutral'))
+
+    winner = result.winner or 'silent'
+    return winner, state.day_number, bool(state.count_alive('neutral'))
+
+def run_batch(lineup, games, seed, agent_name):
+    """Worker entry point: play a batch of games and aggregate the outcomes"""
+    rng = random.Random(seed)
+    outcomes = Counter()
+    total_days = 0
+    neutral_survived = 0
+    for _ in range(games):
+        winner, days, neutral_alive = play_game(lineup, rng, agent_name)
+        outcomes[winner] += 1
+        total_days += days
+        neutral_survived += neutral_alive
+    return outcomes, total_days, neutral_survived
+
+def simulate(pool, lineup, games, agent_name='random', seed=0, batch_size=2000):
+    """Fan a line-up's games out over a process pool and merge the batch results"""
+    batches = [(lineup, min(batch_size, games - start), seed + i, agent_name)
+               for i, start in enumerate(range(0, games, batch_size))]
+    outcomes = Counter()
+    total_days = 0
+    neutral_survived = 0
+    for batch_outcomes, days, neutral in pool.map(run_batch, *zip(*batches)):
+        outcomes.update(batch_outcomes)
+        total_days += days
+        neutral_survived += neutral
+    return {
+        'games': games,
+        'outcomes': outcomes,
+        'avg_days': total_days / games,
+        'neutral_survival': neutral_survived / games if any(ROLES[r]['team'] == 'neutral' for r in lineup) else None
+    }
+
+def format_report(player_count, lineup, report):
+    games = report['games']
+    rates = {key: 100 * report['outcomes'].get(key, 0) / games for key in ('good', 'evil', 'silent', 'stalemate')}
+    neutral = report['neutral_survival']
+    return (f"{player_count:>3} | good {rates['good']:5.1f}% | evil {rates['evil']:5.1f}% | "
+            f"silent {rates['silent']:4.1f}% | stalemate {rates['stalemate']:4.1f}% | "
+            f"days {report['avg_days']:4.2f} | neutral survives {'  n/a' if neutral is None else f'{100 * neutral:4.1f}%'} | "
+            f"{', '.join(lineup)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo role-balance simulator for Shadow Court")
+    parser.add_argument('--games', type=int, default=20000, help="games per line-up")
+    parser.add_argument('--min-players', type=int, default=4)
+    parser.add_argument('--max-players', type=int, default=10)
+    parser.add_argument('--lineup', help="comma-separated custom line-up to test instead of the built-in ones")
+    parser.add_argument('--agent', choices=sorted(AGENTS), default='random')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.lineup:
+        lineups = [args.lineup.split(',')]
+        unknown = [role for role in lineups[0] if role not in ROLES]
+        if unknown:
+            parser.error(f"unknown roles: {', '.join(unknown)}")
+    else:
+        lineups = [engine.get_role_distribution(n) for n in range(args.min_players, args.max_players + 1)]
+
+    print(f"Simulating {args.games} games per line-up with {args.agent} agents on {args.workers} workers")
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for lineup in lineups:
+            report = simulate(pool, lineup, args.games, args.agent, args.seed)
+            print(format_report(len(lineup), lineup, report))
+    elapsed = time.perf_counter() - started
+    total = args.games * len(lineups)
+    print(f"{total} games in {elapsed:.1f}s ({total / elapsed:,.0f} games/s)")
+
+if __name__ == '__main__':
+    main()
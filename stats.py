@@ -0,0 +1,175 @@
+import time
+import sqlite3
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS games ("
+    "game_id TEXT PRIMARY KEY, chat_id INTEGER NOT NULL, finished_at REAL NOT NULL, "
+    "winner TEXT, days INTEGER NOT NULL, players INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS game_players ("
+    "game_id TEXT NOT NULL, user_id INTEGER NOT NULL, role TEXT NOT NULL, team TEXT NOT NULL, "
+    "survived INTEGER NOT NULL, won INTEGER NOT NULL, PRIMARY KEY (game_id, user_id))",
+    "CREATE TABLE IF NOT EXISTS player_stats ("
+    "user_id INTEGER PRIMARY KEY, name TEXT NOT NULL, games INTEGER NOT NULL, wins INTEGER NOT NULL, "
+    "survived INTEGER NOT NULL, last_played REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS chat_player_stats ("
+    "chat_id INTEGER NOT NULL, user_id INTEGER NOT NULL, name TEXT NOT NULL, games INTEGER NOT NULL, "
+    "wins INTEGER NOT NULL, survived INTEGER NOT NULL, PRIMARY KEY (chat_id, user_id))",
+    "CREATE TABLE IF NOT EXISTS player_role_stats ("
+    "user_id INTEGER NOT NULL, role TEXT NOT NULL, games INTEGER NOT NULL, wins INTEGER NOT NULL, "
+    "PRIMARY KEY (user_id, role))",
+    "CREATE TABLE IF NOT EXISTS role_stats ("
+    "role TEXT PRIMARY KEY, games INTEGER NOT NULL, wins INTEGER NOT NULL)",
+    # Leaderboards read the top rows straight off these indexes
+    "CREATE INDEX IF NOT EXISTS player_stats_rank ON player_stats (wins DESC, games)",
+    "CREATE INDEX IF NOT EXISTS chat_player_stats_rank ON chat_player_stats (chat_id, wins DESC, games)",
+)
+
+class StatsStore:
+    """SQLite store of finished games with per-player and per-role counters.
+
+    record() snapshots a finished game on the event loop and queues it. A
+    flush task writes each batch in one transaction from a single writer
+    thread: the raw outcome rows for history, plus upserts that bump the
+    pre-aggregated counters. /stats and /leaderboard only ever read those
+    counters, so they cost the same no matter how many games were played.
+    """
+
+    def __init__(self, path, flush_interval=2.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._pending = []  # [(game row, [player row, ...])]
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stats-store')
+        self._conn = None
+        self._flush_task = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+        self._conn = conn
+
+    def _write_batch(self, batch):
+        games = [game for game, _ in batch]
+        players = [player for _, rows in batch for player in rows]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO games (game_id, chat_id, finished_at, winner, days, players) "
+                "VALUES (?, ?, ?, ?, ?, ?)", games
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO game_players (game_id, user_id, role, team, survived, won) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(game_id, user_id, role, team, survived, won)
+                 for game_id, _, user_id, _, role, team, survived, won, _ in players]
+            )
+            self._conn.executemany(
+                "INSERT INTO player_stats (user_id, name, games, wins, survived, last_played) VALUES (?, ?, 1, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET name = excluded.name, games = games + 1, "
+                "wins = wins + excluded.wins, survived = survived + excluded.survived, last_played = excluded.last_played",
+                [(user_id, name, won, survived, finished_at)
+                 for _, _, user_id, name, _, _, survived, won, finished_at in players]
+            )
+            self._conn.executemany(
+                "INSERT INTO chat_player_stats (chat_id, user_id, name, games, wins, survived) VALUES (?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT(chat_id, user_id) DO UPDATE SET name = excluded.name, games = games + 1, "
+                "wins = wins + excluded.wins, survived = survived + excluded.survived",
+                [(chat_id, user_id, name, won, survived)
+                 for _, chat_id, user_id, name, _, _, survived, won, _ in players]
+            )
+            self._conn.executemany(
+                "INSERT INTO player_role_stats (user_id, role, games, wins) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(user_id, role) DO UPDATE SET games = games + 1, wins = wins + excluded.wins",
+                [(user_id, role, won) for _, _, user_id, _, role, _, _, won, _ in players]
+            )
+            self._conn.executemany(
+                "INSERT INTO role_stats (role, games, wins) VALUES (?, 1, ?) "
+                "ON CONFLICT(role) DO UPDATE SET games = games + 1, wins = wins + excluded.wins",
+                [(role, won) for _, _, _, _, role, _, _, won, _ in players]
+            )
+
+    def _player(self, user_id):
+        row = self._conn.execute(
+            "SELECT name, games, wins, survived FROM player_stats WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        name, games, wins, survived = row
+        roles = self._conn.execute(
+            "SELECT role, games, wins FROM player_role_stats WHERE user_id = ? ORDER BY games DESC, wins DESC",
+            (user_id,)
+        ).fetchall()
+        return {'name': name, 'games': games, 'wins': wins, 'survived': survived, 'roles': roles}
+
+    def _leaderboard(self, chat_id, limit):
+        if chat_id is None:
+            query = "SELECT name, games, wins FROM player_stats ORDER BY wins DESC, games LIMIT ?"
+            return self._conn.execute(query, (limit,)).fetchall()
+        query = ("SELECT name, games, wins FROM chat_player_stats WHERE chat_id = ? "
+                 "ORDER BY wins DESC, games LIMIT ?")
+        return self._conn.execute(query, (chat_id, limit)).fetchall()
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def open(self):
+        await self._run(self._connect)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    def record(self, game, winner):
+        """Queue a finished game's outcome; winner is a team name or None when nobody won"""
+        if game.game_id is None or not game.players:
+            return
+        finished_at = time.time()
+        game_row = (game.game_id, game.group_chat_id, finished_at, winner, game.day_number, len(game.players))
+        player_rows = [
+            (game.game_id, game.group_chat_id, user_id, player.name, player.role, player.team,
+             int(player.alive), int(winner is not None and player.team == winner), finished_at)
+            for user_id, player in game.players.items() if player.role
+        ]
+        self._pending.append((game_row, player_rows))
+
+    async def player(self, user_id):
+        """A player's lifetime counters and per-role record, or None if they never finished a game"""
+        if self._conn is None:
+            return None
+        return await self._run(self._player, user_id)
+
+    async def leaderboard(self, chat_id=None, limit=10):
+        """Top players by wins in one group, or across every group when chat_id is None"""
+        if self._conn is None:
+            return []
+        return await self._run(self._leaderboard, chat_id, limit)
+
+    async def flush(self):
+        if not self._pending or self._conn is None:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await self._run(self._write_batch, batch)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to record {len(batch)} finished game(s): {e}")
+            self._pending = batch + self._pending
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self):
+        """Write out every queued game and release the database"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=True)
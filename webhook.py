@@ -0,0 +1,85 @@
+import hmac
+import signal
+import asyncio
+import logging
+from aiohttp import web
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+class WebhookReceiver:
+    """aiohttp endpoint that feeds Telegram webhook posts into the application's update queue.
+
+    Requests without the configured secret token are rejected. When the update
+    queue is full, or the application is shutting down and will not process
+    it, the post is refused with 503 so Telegram backs off and redelivers it
+    later instead of the update being buffered without bound or lost.
+    """
+
+    def __init__(self, application, secret_token=None):
+        self.application = application
+        self.secret_token = secret_token
+
+    def register(self, app, path):
+        app.router.add_post(path, self.handle)
+
+    async def handle(self, request):
+        if self.secret_token is not None:
+            supplied = request.headers.get(SECRET_HEADER, '')
+            if not hmac.compare_digest(supplied.encode(), self.secret_token.encode()):
+                return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except Exception as e:
+            logger.warning(f"Rejected malformed webhook payload: {e}")
+            return web.Response(status=400)
+
+        if not self.application.running:
+            return web.Response(status=503, headers={'Retry-After': '1'})
+        try:
+            self.application.update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            logger.warning("Update queue full, asking Telegram to redeliver later")
+            return web.Response(status=503, headers={'Retry-After': '1'})
+        return web.Response()
+
+async def serve_webhook(application, webhook_url, secret_token=None, max_connections=40,
+                        post_init=None, post_stop=None, post_shutdown=None):
+    """Run the application on webhook updates until SIGINT/SIGTERM.
+
+    Mirrors Application.run_polling's lifecycle, but updates arrive through
+    WebhookReceiver on the bot's own aiohttp server instead of the Updater.
+    Sharded workers pass no webhook_url: the ingress owns the webhook and
+    forwards their updates.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await application.initialize()
+    try:
+        if post_init:
+            await post_init(application)
+        if webhook_url:
+            await application.bot.set_webhook(
+                url=webhook_url,
+                secret_token=secret_token,
+                max_connections=max_connections,
+                allowed_updates=Update.ALL_TYPES
+            )
+        await application.start()
+        logger.info(f"Receiving updates via webhook at {webhook_url or 'the worker socket'}")
+        await stop.wait()
+    finally:
+        if application.running:
+            await application.stop()
+            if post_stop:
+                await post_stop(application)
+        await application.shutdown()
+        if post_shutdown:
+            await post_shutdown(application)